@@ -1,31 +1,95 @@
-# AI algorithms for Tic Tac Toe: Minimax and Alpha-Beta Pruning
+# AI algorithms for Tic Tac Toe: Minimax and Alpha-Beta Pruning (and Auto, see auto.py)
 
+import copy
 import time
-from utils import PerformanceTracker
+import contextlib
+import metrics as engine_metrics
+from memory_profile import MemoryProfile
+from tactics import find_forced_move
+# A win found at ply p scores WIN_SCORE - p (shared with ttt_backend), so quicker wins are preferred
+from ttt_backend import (EXACT, LOWER, UPPER, WIN_SCORE, get_ai_move, position_key, to_table_score,
+                         from_table_score)
+from utils import PerformanceTracker, SearchCancelled, run_cancellable
 
 class AIPlayer:
-    def __init__(self, algorithm='minimax', player_symbol='O'):
+    def __init__(self, algorithm='minimax', player_symbol='O', max_depth=None, evaluator=None,
+                 forced_moves=True, session=None, profile_memory=False, book=None, time_limit_ms=None):
         self.algorithm = algorithm
+        self.max_depth = max_depth  # plies to search (None = to the end of the game)
+        self.evaluator = evaluator  # leaf evaluator at the depth limit (evaluation.LineEvaluator)
+        self.forced_moves = forced_moves  # play wins, blocks and forks without searching
+        self.session = session  # session.EngineSession shared by the game (alpha_beta only)
+        self.profile_memory = profile_memory  # measure each search with tracemalloc (slow)
+        self.book = book  # opening_book.OpeningBook consulted before searching
+        self.time_limit_ms = time_limit_ms  # target latency of the 'auto' algorithm
         self.player_symbol = player_symbol
         if player_symbol == 'X':
             self.opponent_symbol = 'O'
         else:
             self.opponent_symbol = 'X'
         self.performance_tracker = PerformanceTracker()
+        self._cancel = None  # CancelToken of the running search, if any
     
-    def get_move(self, board):
-        """Get the best move for the AI using the selected algorithm"""
+    def get_move(self, board, cancel=None):
+        """Get the best move for the AI using the selected algorithm.
+        If a CancelToken is given, the search raises SearchCancelled once it is cancelled."""
         # Reset performance tracking
         self.performance_tracker.reset()
         
         start_time = time.time() 
         
-        if self.algorithm == 'minimax':
-            score, move = self.minimax(board, True)
-        elif self.algorithm == 'alpha_beta':
-            score, move = self.alpha_beta(board, float('-inf'), float('inf'), True)
-        else:
-            raise ValueError("Invalid algorithm. Choose 'minimax' or 'alpha_beta'")
+        if self.algorithm not in ('minimax', 'alpha_beta', 'auto'):
+            raise ValueError("Invalid algorithm. Choose 'minimax', 'alpha_beta' or 'auto'")
+        
+        if self.algorithm == 'auto':
+            return self._auto_move(board, cancel, start_time)
+        
+        # Opening book (see opening_book.py)
+        if self.book is not None and board.check_winner() is None:
+            index = self.book.lookup(board.to_list(), self.player_symbol, board.win_length)
+            if index is not None:
+                decision_time = (time.time() - start_time) * 1000
+                self.performance_tracker.book_move = True
+                self.performance_tracker.update_performance(decision_time, 0)
+                engine_metrics.record_search(self.algorithm, decision_time, 0)
+                engine_metrics.record_book_hit(self.algorithm)
+                return divmod(index, board.size)
+        
+        # Forced-move fast path (see tactics.py)
+        if self.forced_moves and board.check_winner() is None:
+            index, tactic = find_forced_move(board.to_list(), self.player_symbol, board.win_length)
+            if index is not None:
+                decision_time = (time.time() - start_time) * 1000
+                self.performance_tracker.forced_move = tactic
+                self.performance_tracker.update_performance(decision_time, 0)
+                engine_metrics.record_search(self.algorithm, decision_time, 0)
+                engine_metrics.record_forced_move(self.algorithm, tactic)
+                return divmod(index, board.size)
+        
+        self._cancel = cancel
+        if self.evaluator is not None:
+            self.evaluator.reset(board.to_list())
+        session = self.session if self.algorithm == 'alpha_beta' else None
+        if session is not None:
+            reused_before = session.begin_search()
+        profile = MemoryProfile() if self.profile_memory else contextlib.nullcontext()
+        # The search marks cells in place; a cancelled search stops mid-line, so it works on a copy
+        search_board = copy.deepcopy(board)
+        try:
+            with profile:
+                if self.algorithm == 'minimax':
+                    score, move = self.minimax(search_board, True)
+                elif self.algorithm == 'alpha_beta':
+                    score, move = self.alpha_beta(search_board, float('-inf'), float('inf'), True)
+                else:
+                    raise ValueError("Invalid algorithm. Choose 'minimax' or 'alpha_beta'")
+        finally:
+            self._cancel = None
+        if self.profile_memory:
+            self.performance_tracker.memory = profile.metrics(self.performance_tracker.nodes_explored)
+        if session is not None and move is not None:  # no move on a finished board
+            self.performance_tracker.reused = session.end_search(
+                board.to_list(), self.player_symbol, move[0] * board.size + move[1], reused_before)
         
         end_time = time.time()
         decision_time = (end_time - start_time) * 1000  # Convert to milliseconds
@@ -33,30 +97,73 @@ class AIPlayer:
         # Update performance metrics
         self.performance_tracker.update_performance(decision_time, 
                                                    self.performance_tracker.nodes_explored)
+        engine_metrics.record_search(self.algorithm, decision_time,
+                                     self.performance_tracker.nodes_explored,
+                                     self.performance_tracker.pruned_nodes,
+                                     reused=self.performance_tracker.reused)
         
         return move
     
-    def minimax(self, board, is_maximizing):
-        """Standard Minimax algorithm implementation"""
+    def _auto_move(self, board, cancel, start_time):
+        """Let the Auto engine (auto.py) pick and run a search on the board's cells.
+        max_depth caps the depth it may choose."""
+        index, metrics = get_ai_move(board.to_list(), self.player_symbol, "Auto", cancel=cancel,
+                                     win_length=board.win_length, max_depth=self.max_depth,
+                                     evaluator=self.evaluator, forced_moves=self.forced_moves,
+                                     session=self.session, profile_memory=self.profile_memory,
+                                     book=self.book, time_limit_ms=self.time_limit_ms)
+        tracker = self.performance_tracker
+        tracker.nodes_explored = metrics["nodes"]
+        tracker.pruned_nodes = metrics["pruned"] or 0
+        tracker.forced_move = metrics.get("tactic")
+        tracker.book_move = bool(metrics.get("book"))
+        tracker.reused = metrics.get("reused", 0)
+        tracker.memory = {key: metrics[key] for key in ("peak_kb", "alloc_blocks", "bytes_per_node") if key in metrics}
+        tracker.engine = metrics["engine"]
+        tracker.engine_reason = metrics["reason"]
+        tracker.update_performance((time.time() - start_time) * 1000, tracker.nodes_explored)
+        return divmod(index, board.size)
+    
+    async def get_move_async(self, board):
+        """Coroutine version of get_move that runs the search in the shared search executor.
+        The search works on a copy of the board; cancelling the awaiting task stops it."""
+        return await run_cancellable(self.get_move, copy.deepcopy(board))
+    
+    def _check_cancelled(self):
+        if self._cancel is not None and self._cancel.cancelled:
+            raise SearchCancelled()
+    
+    def minimax(self, board, is_maximizing, ply=0):
+        """Standard Minimax algorithm implementation (ply = distance from the root)"""
         winner = board.check_winner()
         
         # Base cases
         if winner == self.player_symbol:
-            return 10, None
+            return WIN_SCORE - ply, None
         elif winner == self.opponent_symbol:
-            return -10, None
+            return -(WIN_SCORE - ply), None
         elif winner == 'Draw':
             return 0, None
+        if self.max_depth is not None and ply >= self.max_depth:
+            # Depth limit reached: use the heuristic evaluation, or treat as undecided
+            if self.evaluator is not None:
+                return self.evaluator.score(self.player_symbol), None
+            return 0, None
             
         self.performance_tracker.increment_nodes_explored()  # Count nodes explored
+        self._check_cancelled()
         
         if is_maximizing:
             best_score = float('-inf')
             best_move = None
             for row, col in board.get_empty_cells():
                 board.make_move(row, col, self.player_symbol)
-                score, _ = self.minimax(board, False)
+                if self.evaluator is not None:
+                    self.evaluator.place(row * board.size + col, self.player_symbol)
+                score, _ = self.minimax(board, False, ply + 1)
                 board.undo_move(row, col)
+                if self.evaluator is not None:
+                    self.evaluator.remove(row * board.size + col, self.player_symbol)
                 
                 if score > best_score:
                     best_score = score
@@ -67,35 +174,85 @@ class AIPlayer:
             best_move = None
             for row, col in board.get_empty_cells():
                 board.make_move(row, col, self.opponent_symbol)
-                score, _ = self.minimax(board, True)
+                if self.evaluator is not None:
+                    self.evaluator.place(row * board.size + col, self.opponent_symbol)
+                score, _ = self.minimax(board, True, ply + 1)
                 board.undo_move(row, col)
+                if self.evaluator is not None:
+                    self.evaluator.remove(row * board.size + col, self.opponent_symbol)
                 
                 if score < best_score:
                     best_score = score
                     best_move = (row, col)
             return best_score, best_move
     
-    def alpha_beta(self, board, alpha, beta, is_maximizing):
-        """Alpha-Beta Pruning optimization of Minimax"""
+    def alpha_beta(self, board, alpha, beta, is_maximizing, ply=0):
+        """Alpha-Beta Pruning optimization of Minimax, with mate-distance pruning"""
         winner = board.check_winner()
         
         # Base cases
         if winner == self.player_symbol:
-            return 10, None
+            return WIN_SCORE - ply, None
         elif winner == self.opponent_symbol:
-            return -10, None
+            return -(WIN_SCORE - ply), None
         elif winner == 'Draw':
             return 0, None
+        if self.max_depth is not None and ply >= self.max_depth:
+            # Depth limit reached: use the heuristic evaluation, or treat as undecided
+            if self.evaluator is not None:
+                return self.evaluator.score(self.player_symbol), None
+            return 0, None
             
         self.performance_tracker.increment_nodes_explored()  # Count nodes explored
+        self._check_cancelled()
+        
+        # Mate-distance pruning: nothing below this node beats a win on the next ply,
+        # so narrow the window
+        bound = WIN_SCORE - (ply + 1)
+        alpha = max(alpha, -bound)
+        beta = min(beta, bound)
+        if alpha >= beta:
+            self.performance_tracker.increment_pruned_nodes()
+            return alpha, None
+        
+        moves = board.get_empty_cells()
+        session = self.session
+        if session is not None:
+            # Session cache lookup (same table format as ttt_backend.alphabeta)
+            cells = board.to_list()
+            depth = len(moves) if self.max_depth is None else min(len(moves), self.max_depth - ply)
+            sign = 1 if self.player_symbol == 'X' else -1
+            key = position_key(cells, self.player_symbol if is_maximizing else self.opponent_symbol,
+                               board.win_length)
+            alpha_orig, beta_orig = alpha, beta
+            entry = session.table.probe(key)
+            tt_move = entry[2] if entry is not None else None
+            # The root always searches, so it keeps the first best move in board order
+            if entry is not None and entry[3] >= depth and ply > 0:
+                score = from_table_score(entry[0], ply, sign)
+                bound = entry[1] if sign == 1 else (EXACT, UPPER, LOWER)[entry[1]]
+                if bound == EXACT:
+                    return score, divmod(entry[2], board.size) if entry[2] is not None else None
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score, divmod(entry[2], board.size) if entry[2] is not None else None
+            if ply > 0:
+                moves = self._order_moves(moves, board.size, tt_move, ply)
         
         if is_maximizing:
             best_score = float('-inf')
             best_move = None
-            for row, col in board.get_empty_cells():
+            for row, col in moves:
                 board.make_move(row, col, self.player_symbol)
-                score, _ = self.alpha_beta(board, alpha, beta, False)
+                if self.evaluator is not None:
+                    self.evaluator.place(row * board.size + col, self.player_symbol)
+                score, _ = self.alpha_beta(board, alpha, beta, False, ply + 1)
                 board.undo_move(row, col)
+                if self.evaluator is not None:
+                    self.evaluator.remove(row * board.size + col, self.player_symbol)
                 
                 if score > best_score:
                     best_score = score
@@ -105,15 +262,20 @@ class AIPlayer:
                 alpha = max(alpha, best_score)
                 if beta <= alpha:
                     self.performance_tracker.increment_pruned_nodes()
+                    if session is not None:
+                        session.history[row * board.size + col] += depth * depth
                     break  # Prune the remaining branches
-            return best_score, best_move
         else:
             best_score = float('inf')
             best_move = None
-            for row, col in board.get_empty_cells():
+            for row, col in moves:
                 board.make_move(row, col, self.opponent_symbol)
-                score, _ = self.alpha_beta(board, alpha, beta, True)
+                if self.evaluator is not None:
+                    self.evaluator.place(row * board.size + col, self.opponent_symbol)
+                score, _ = self.alpha_beta(board, alpha, beta, True, ply + 1)
                 board.undo_move(row, col)
+                if self.evaluator is not None:
+                    self.evaluator.remove(row * board.size + col, self.opponent_symbol)
                 
                 if score < best_score:
                     best_score = score
@@ -123,8 +285,36 @@ class AIPlayer:
                 beta = min(beta, best_score)
                 if beta <= alpha:
                     self.performance_tracker.increment_pruned_nodes()
+                    if session is not None:
+                        session.history[row * board.size + col] += depth * depth
                     break  # Prune the remaining branches
-            return best_score, best_move
+        
+        if session is not None:
+            if best_score <= alpha_orig:
+                bound = UPPER
+            elif best_score >= beta_orig:
+                bound = LOWER
+            else:
+                bound = EXACT
+            if sign == -1 and bound != EXACT:
+                bound = LOWER if bound == UPPER else UPPER
+            session.table.store(key, to_table_score(best_score, ply, sign), bound,
+                                best_move[0] * board.size + best_move[1] if best_move else None,
+                                depth, len(cells) - len(moves))
+        return best_score, best_move
+    
+    def _order_moves(self, moves, size, tt_move, ply):
+        """Session move ordering: cached best move, then the expected PV move, then by history score"""
+        history = self.session.history
+        pv = self.session.pv
+        ordered = sorted(moves, key=lambda cell: -history[cell[0] * size + cell[1]])
+        for first in ((pv[ply] if ply < len(pv) else None), tt_move):
+            if first is not None:
+                cell = divmod(first, size)
+                if cell in ordered:
+                    ordered.remove(cell)
+                    ordered.insert(0, cell)
+        return ordered
 
     def get_performance(self):
         """Get current performance metrics"""
@@ -0,0 +1,394 @@
+# Auto engine: picks the search engine for every move from a measured cost model
+
+"""
+How long a search takes depends on the empty cells, the board geometry, the depth
+limit and whether a cache from earlier moves is available, and ranges from well under
+a millisecond to minutes. The cost model holds measured Alpha-Beta search times for
+each geometry: exact and at every depth limit up to two plies past the front-end
+default, cold (no cache) and warm (an EngineSession that searched the position two
+plies earlier), at a range of empty-cell counts. Predictions interpolate between the
+measurements on a log scale.
+
+For each move get_auto_move() uses the first of these that applies:
+  1. book                - the position is in the opening book (a table lookup)
+  2. tactics             - a forced win, block or fork (tactics.py)
+  3. Alpha-Beta          - the exact search is predicted to meet the target latency
+  4. Alpha-Beta depth d  - the deepest fixed-depth search predicted to meet it, if it
+                           is at least as deep as the front ends search by default
+  5. Iterative Deepening - only a shallower search fits: deepen until the time is up
+  6. MCTS                - not even a depth-2 search fits: Monte Carlo tree search
+Steps 1 and 2 happen inside the chosen engine's get_ai_move call and are reported
+afterwards. metrics gain engine, reason, predicted_ms and target_ms.
+
+The model is calibrated by a benchmark run and saved to cost_model.json:
+
+    python auto.py calibrate                 # every geometry, about a minute
+    python auto.py calibrate --size 5        # one geometry, merged into the file
+    python auto.py bench --size 5 --target 200
+
+The cost_model.json in the repository was measured on a single-core machine; calibrate
+on the machine that runs the engine. Without a model for the geometry, Auto uses
+Iterative Deepening, which keeps to the time limit by itself.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import time
+
+import metrics as engine_metrics
+import ttt_backend as backend
+from session import EngineSession
+from utils import DeadlineToken, SearchCancelled
+
+COST_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cost_model.json")
+
+
+def _interpolate(points, x):
+    """Log-linear interpolation of [(x, ms), ...] sorted by x, extended past the ends
+    along the nearest segment (never below the last or above the first measurement)"""
+    if len(points) == 1:
+        return points[0][1]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        if x <= x1:
+            break
+    t = (x - x0) / (x1 - x0)
+    value = math.exp(math.log(y0) + t * (math.log(y1) - math.log(y0)))
+    if x > points[-1][0]:
+        return max(value, points[-1][1])
+    if x < points[0][0]:
+        return min(value, points[0][1])
+    return value
+
+
+class CostModel:
+    """Measured search times: (geometry, depth limit, cache state) -> [(empty cells, ms), ...]"""
+
+    def __init__(self, series=None, info=None):
+        # key -> {"points": [[empty, slowest ms], ...], "over": [empty, cap ms] or None}
+        # "over" marks the first empty-cell count whose searches hit the calibration cap
+        self.series = series if series is not None else {}
+        self.info = info if info is not None else {}
+
+    @staticmethod
+    def key(size, win_length, depth, warm):
+        limit = "full" if depth is None else f"d{depth}"
+        return f"{size}x{size}k{win_length}/{limit}/{'warm' if warm else 'cold'}"
+
+    def has_geometry(self, size, win_length):
+        prefix = f"{size}x{size}k{win_length}/"
+        return any(key.startswith(prefix) for key in self.series)
+
+    def depths(self, size, win_length):
+        """Depth limits measured for a geometry"""
+        prefix = f"{size}x{size}k{win_length}/d"
+        return sorted({int(key[len(prefix):].split("/")[0]) for key in self.series if key.startswith(prefix)})
+
+    def predict(self, size, win_length, depth, warm, empty):
+        """Predicted search time in ms, or None if the variant was not measured.
+        Warm predictions fall back to the cold measurements."""
+        series = self.series.get(self.key(size, win_length, depth, warm))
+        if series is None and warm:
+            series = self.series.get(self.key(size, win_length, depth, False))
+        if series is None:
+            return None
+        over = series.get("over")
+        if over is not None and empty >= over[0]:
+            return max(over[1], _interpolate(series["points"], empty) if series["points"] else 0.0)
+        if not series["points"]:
+            return None
+        return _interpolate(series["points"], empty)
+
+    def save(self, path=COST_MODEL_PATH):
+        """Write the model as JSON, one series per line (so recalibrations diff well)"""
+        series = ",\n".join(f"  {json.dumps(key)}: {json.dumps(self.series[key], sort_keys=True)}"
+                            for key in sorted(self.series))
+        with open(path, "w") as handle:
+            handle.write(f'{{\n "info": {json.dumps(self.info, sort_keys=True)},\n "series": {{\n{series}\n }}\n}}\n')
+
+    @classmethod
+    def load(cls, path=COST_MODEL_PATH):
+        with open(path) as handle:
+            data = json.load(handle)
+        return cls(data["series"], data.get("info"))
+
+
+_MODELS = {}
+
+
+def load_cost_model(path=None):
+    """The cost model at path (cost_model.json by default), loaded once; an empty model
+    if the file does not exist"""
+    path = path or COST_MODEL_PATH
+    if path not in _MODELS:
+        _MODELS[path] = CostModel.load(path) if os.path.exists(path) else CostModel()
+    return _MODELS[path]
+
+
+# - Engine selection
+def _is_warm(session, cache):
+    table = session.table if session is not None else cache
+    return table is not None and len(table) > 0
+
+
+def choose_engine(board, win_length, target_ms, warm=False, max_depth=None, model=None):
+    """
+    Pick the search engine for a position (steps 3-6 in the module docstring).
+    `warm` says whether a cache filled by earlier moves is available; `max_depth` caps the
+    depth that may be chosen. Returns (algo, max_depth, predicted_ms, reason).
+    """
+    size = backend.board_size(board)
+    empty = board.count(" ")
+    if model is None:
+        model = load_cost_model()
+    cache_state = "warm cache" if warm else "no cache"
+    if not model.has_geometry(size, win_length):
+        return ("Iterative Deepening", max_depth, target_ms,
+                f"no cost model for {size}x{size} k={win_length}; iterative deepening keeps to the time limit")
+
+    exact = None
+    if max_depth is None or max_depth >= empty:
+        exact = model.predict(size, win_length, None, warm, empty)
+        if exact is not None and exact <= target_ms:
+            return ("Alpha-Beta", None, exact,
+                    f"exact search predicted {exact:.1f} ms ({empty} empty, {cache_state}) "
+                    f"within {target_ms:g} ms")
+    exact_text = "exact search not allowed" if max_depth is not None and max_depth < empty else (
+        f"exact search predicted {exact:.0f} ms" if exact is not None else "exact search not measured")
+
+    best = None  # deepest (depth, predicted ms) that meets the target
+    for depth in model.depths(size, win_length):
+        if depth >= empty or (max_depth is not None and depth > max_depth):
+            continue
+        predicted = model.predict(size, win_length, depth, warm, empty)
+        if predicted is not None and predicted <= target_ms:
+            best = (depth, predicted)
+
+    wanted = backend.default_search_depth(size) or empty
+    if best is not None and best[0] >= wanted:
+        return ("Alpha-Beta", best[0], best[1],
+                f"depth {best[0]} predicted {best[1]:.1f} ms ({empty} empty, {cache_state}) "
+                f"within {target_ms:g} ms; {exact_text}")
+    if best is not None and best[0] >= 2:
+        return ("Iterative Deepening", max_depth, target_ms,
+                f"only depth {best[0]} is predicted within {target_ms:g} ms ({best[1]:.1f} ms); "
+                f"iterative deepening uses the whole budget")
+    shallow = model.predict(size, win_length, 2, warm, empty)
+    shallow_text = f"{shallow:.1f} ms" if shallow is not None else "not measured"
+    return ("MCTS", None, target_ms,
+            f"depth-2 search predicted {shallow_text} ({empty} empty, {cache_state}), over {target_ms:g} ms; "
+            f"MCTS answers within the time limit")
+
+
+def get_auto_move(board, player, cache=None, cancel=None, win_length=None, max_depth=None, evaluator=None,
+                  forced_moves=True, session=None, profile_memory=False, book=None, time_limit_ms=None,
+                  model=None, recorder=None):
+    """
+    get_ai_move(..., "Auto"): choose an engine with choose_engine() and run it.
+    `time_limit_ms` is the target latency (ttt_backend.DEFAULT_TIME_LIMIT_MS if None) and
+    `max_depth` caps the chosen depth. Returns (move_index, metrics).
+    """
+    size = backend.board_size(board)
+    if win_length is None:
+        win_length = backend.default_win_length(size)
+    target_ms = time_limit_ms if time_limit_ms is not None else backend.DEFAULT_TIME_LIMIT_MS
+    algo, depth, predicted_ms, reason = choose_engine(board, win_length, target_ms,
+                                                      _is_warm(session, cache), max_depth, model)
+    if evaluator is None and (depth is not None or algo == "Iterative Deepening"):
+        from evaluation import LineEvaluator
+        evaluator = LineEvaluator(size, win_length)
+
+    move, metrics = backend.get_ai_move(board, player, algo, cache, cancel, win_length, depth, evaluator,
+                                        forced_moves, session, profile_memory, book, target_ms, recorder)
+
+    engine = f"Alpha-Beta depth {depth}" if algo == "Alpha-Beta" and depth is not None else algo
+    if metrics.get("book"):
+        engine, predicted_ms, reason = "book", 0.0, "position is in the opening book"
+    elif metrics.get("tactic"):
+        engine, predicted_ms, reason = "tactics", 0.0, f"forced move ({metrics['tactic']}), no search needed"
+    metrics.update(engine=engine, reason=reason,
+                   predicted_ms=round(predicted_ms, 3) if predicted_ms is not None else None,
+                   target_ms=target_ms)
+    engine_metrics.record_auto_choice(engine)
+    return move, metrics
+
+
+# - Calibration
+def _to_move(marks):
+    return "X" if marks % 2 == 0 else "O"
+
+
+def _random_position(size, win_length, marks, rng):
+    """A random ongoing position with `marks` marks (X moved first), or None"""
+    for _ in range(100):
+        board = backend.new_board(size)
+        for turn, cell in enumerate(rng.sample(range(size * size), marks)):
+            board[cell] = _to_move(turn)
+        if backend.check_result(board, win_length)["status"] == "ongoing":
+            return board
+    return None
+
+
+def _timed_search(board, player, win_length, depth, cap_ms, session=None):
+    """(ms, move) of one Alpha-Beta search; raises SearchCancelled if it takes over cap_ms"""
+    evaluator = None
+    if depth is not None:
+        from evaluation import LineEvaluator
+        evaluator = LineEvaluator(backend.board_size(board), win_length)
+    start = time.perf_counter()
+    move, _ = backend.get_ai_move(list(board), player, "Alpha-Beta", cancel=DeadlineToken(cap_ms / 1000.0),
+                                  win_length=win_length, max_depth=depth, evaluator=evaluator,
+                                  forced_moves=False, session=session)
+    return (time.perf_counter() - start) * 1000.0, move
+
+
+def _measure(size, win_length, empty, depth, warm, cap_ms, rng):
+    """
+    Time one search of a random position with `empty` empty cells; None if there was no
+    position to time. Warm searches reuse a session that searched the position two plies
+    earlier and played its move, as in a game. Raises SearchCancelled at the cap.
+    """
+    marks = size * size - empty
+    if not warm:
+        board = _random_position(size, win_length, marks, rng)
+        if board is None:
+            return None
+        return _timed_search(board, _to_move(marks), win_length, depth, cap_ms)[0]
+    if marks < 2:
+        return None
+    board = _random_position(size, win_length, marks - 2, rng)
+    if board is None:
+        return None
+    session = EngineSession(size, win_length)
+    player = _to_move(marks - 2)
+    _, move = _timed_search(board, player, win_length, depth, cap_ms, session)
+    board[move] = player
+    session.advance(move)
+    if backend.check_result(board, win_length)["status"] != "ongoing":
+        return None
+    reply = rng.choice(backend.available_moves(board))
+    board[reply] = "O" if player == "X" else "X"
+    session.advance(reply)
+    if backend.check_result(board, win_length)["status"] != "ongoing":
+        return None
+    return _timed_search(board, player, win_length, depth, cap_ms, session)[0]
+
+
+def calibrate(geometries=None, samples=3, cap_ms=2000.0, seed=0, progress=None):
+    """
+    Benchmark Alpha-Beta on random positions and return the CostModel.
+    Every variant is timed on `samples` positions per empty-cell count (every second
+    count up to the empty board) and the slowest is kept, so predictions err on the slow
+    side; a variant stops at the first count whose searches take over `cap_ms`. `progress(key, series)` is called after each variant.
+    """
+    rng = random.Random(seed)
+    model = CostModel(info={
+        "calibrated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": platform.platform(),
+        "python": platform.python_version(),
+        "samples": samples,
+        "cap_ms": cap_ms,
+    })
+    for size, win_length in geometries or backend.GEOMETRIES:
+        cells = size * size
+        depths = [None] + list(range(1, (backend.default_search_depth(size) or 0) + 3))
+        for depth in depths:
+            for warm in (False, True):
+                points, over = [], None
+                for empty in range(cells % 2 or 2, cells + 1, 2):
+                    times = []
+                    try:
+                        for _ in range(samples):
+                            elapsed = _measure(size, win_length, empty, depth, warm, cap_ms, rng)
+                            if elapsed is not None:
+                                times.append(elapsed)
+                    except SearchCancelled:
+                        over = [empty, cap_ms]
+                        break
+                    if times:
+                        points.append([empty, round(max(max(times), 0.001), 3)])
+                key = CostModel.key(size, win_length, depth, warm)
+                model.series[key] = {"points": points, "over": over}
+                if progress is not None:
+                    progress(key, model.series[key])
+    return model
+
+
+# - Benchmark
+def bench(size, target_ms, games=4, seed=0, model=None):
+    """
+    Play Auto against itself (one EngineSession per game, a random first move) and
+    return per-move rows of (engine, ms).
+    """
+    win_length = backend.default_win_length(size)
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(games):
+        session = EngineSession(size, win_length)
+        board = backend.new_board(size)
+        first = rng.randrange(size * size)
+        board[first] = "X"
+        session.advance(first)
+        player = "O"
+        while backend.check_result(board, win_length)["status"] == "ongoing":
+            start = time.perf_counter()
+            move, metrics = get_auto_move(board, player, win_length=win_length, session=session,
+                                          time_limit_ms=target_ms, model=model)
+            rows.append((metrics["engine"], (time.perf_counter() - start) * 1000.0))
+            board[move] = player
+            session.advance(move)
+            player = "O" if player == "X" else "X"
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate and benchmark the Auto engine's cost model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibration = commands.add_parser("calibrate", help="time Alpha-Beta variants and save the cost model")
+    calibration.add_argument("--size", type=int, default=None, choices=[size for size, _ in backend.GEOMETRIES],
+                             help="calibrate one geometry and merge it into the existing model")
+    calibration.add_argument("--samples", type=int, default=3)
+    calibration.add_argument("--cap-ms", type=float, default=2000.0)
+    calibration.add_argument("--out", default=COST_MODEL_PATH)
+    benchmark = commands.add_parser("bench", help="Auto vs Auto games: latency against the target")
+    benchmark.add_argument("--size", type=int, default=5, choices=[size for size, _ in backend.GEOMETRIES])
+    benchmark.add_argument("--target", type=float, default=backend.DEFAULT_TIME_LIMIT_MS, help="target ms per move")
+    benchmark.add_argument("--games", type=int, default=4)
+    benchmark.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        geometries = [(size, k) for size, k in backend.GEOMETRIES if args.size in (None, size)]
+        start = time.perf_counter()
+        model = calibrate(geometries, args.samples, args.cap_ms,
+                          progress=lambda key, series: print(f"{key:<18} {len(series['points'])} points"
+                                                             + (f", over {args.cap_ms:g} ms from {series['over'][0]}"
+                                                                f" empty" if series["over"] else ""), flush=True))
+        if args.size is not None and os.path.exists(args.out):
+            merged = CostModel.load(args.out)
+            prefix = f"{args.size}x{args.size}k"
+            merged.series = {key: series for key, series in merged.series.items() if not key.startswith(prefix)}
+            merged.series.update(model.series)
+            merged.info = model.info
+            model = merged
+        model.save(args.out)
+        print(f"Saved {len(model.series)} series to {args.out} in {time.perf_counter() - start:.0f} s")
+        return
+
+    rows = bench(args.size, args.target, args.games, args.seed)
+    times = sorted(ms for _, ms in rows)
+    print(f"{args.size}x{args.size}, {args.games} games of Auto vs Auto, target {args.target:g} ms per move")
+    print(f"  moves: {len(rows)}, median {statistics.median(times):.1f} ms, "
+          f"p95 {times[int(0.95 * (len(times) - 1))]:.1f} ms, max {times[-1]:.1f} ms, "
+          f"over target {sum(ms > args.target for ms in times) / len(times):.0%}")
+    for engine in sorted({engine for engine, _ in rows}):
+        chosen = [ms for name, ms in rows if name == engine]
+        print(f"  {engine:<22} {len(chosen):>4} moves, median {statistics.median(chosen):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
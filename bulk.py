@@ -0,0 +1,216 @@
+# Vectorized result checks and legality validation for many positions at once
+
+"""
+The scalar checks (ttt_backend.check_result, check_winner_1d, game.Board.check_winner)
+look at one board at a time. check_positions() takes an (N, cells) int8 NumPy array,
+one position per row with 0 = empty, 1 = X, 2 = O (ttt_backend's cell codes), and
+checks every row with whole-array mask operations:
+
+  1. each row's X and O cells are packed into one integer bitboard (np.packbits)
+  2. for every winning line, (bits & line_mask) == line_mask over all rows at once
+  3. winner and winning line come from the first completed line in
+     ttt_backend.win_lines order, exactly as the scalar checks report them
+  4. full boards and mark counts come from the bitboards too (np.bitwise_count,
+     NumPy 2.0 or later)
+
+It returns a dict of length-N arrays:
+  winner    int8   0 none, 1 X, 2 O
+  line      int16  index into ttt_backend.win_lines(size, win_length), -1 if none
+  draw      bool   no winner and no empty cell
+  status    int8   STATUS_ONGOING, STATUS_DRAW or STATUS_WIN
+  parity_ok bool   X has as many marks as O or one more (X moves first)
+  both_won  bool   X and O both have a completed line (impossible in a real game)
+  legal     bool   valid cell codes, parity_ok, not both_won, and the winner made the
+                   last move (X wins with one more mark than O, O with as many)
+
+    python bulk.py            # check against the scalar functions, then benchmark
+"""
+
+import math
+import time
+
+import numpy as np
+
+import ttt_backend as backend
+
+STATUS_ONGOING, STATUS_DRAW, STATUS_WIN = 0, 1, 2
+
+_CODES = {" ": 0, "X": 1, "O": 2}
+_MARKS = np.array([" ", "X", "O"])
+
+_LINE_MASKS = {}
+
+
+def line_masks(size, win_length=None):
+    """Bitmask (cell i = bit i) of every winning line, in win_lines order"""
+    if win_length is None:
+        win_length = backend.default_win_length(size)
+    key = (size, win_length)
+    if key not in _LINE_MASKS:
+        _LINE_MASKS[key] = [sum(1 << cell for cell in line) for line in backend.win_lines(size, win_length)]
+    return _LINE_MASKS[key]
+
+
+def encode(boards):
+    """(N, cells) int8 array of 1D boards (lists or strings of 'X', 'O' and ' ')"""
+    return np.array([[_CODES[mark] for mark in board] for board in boards], dtype=np.int8)
+
+
+def decode(positions):
+    """1D boards (lists of 'X', 'O' and ' ') of an (N, cells) array"""
+    return [list(row) for row in _MARKS[positions]]
+
+
+def _bitboards(mask):
+    """Pack an (N, cells) bool array into one unsigned integer per row (cell i = bit i)"""
+    packed = np.packbits(mask, axis=1, bitorder="little")
+    width = 4 if packed.shape[1] <= 4 else 8
+    if packed.shape[1] < width:
+        packed = np.pad(packed, ((0, 0), (0, width - packed.shape[1])))
+    return packed.view("<u4" if width == 4 else "<u8").reshape(-1)
+
+
+def check_positions(positions, win_length=None):
+    """Check every row of an (N, cells) int8 array; see the module docstring for the result"""
+    positions = np.asarray(positions, dtype=np.int8)
+    if positions.ndim != 2:
+        raise ValueError(f"expected an (N, cells) array, got shape {positions.shape}")
+    cells = positions.shape[1]
+    size = math.isqrt(cells)
+    if size * size != cells or cells > 64:
+        raise ValueError(f"{cells} cells is not a square board of at most 8x8")
+
+    x_bits = _bitboards(positions == 1)
+    o_bits = _bitboards(positions == 2)
+
+    count = len(positions)
+    line = np.full(count, -1, dtype=np.int16)
+    x_won = np.zeros(count, dtype=bool)
+    o_won = np.zeros(count, dtype=bool)
+    # Walk the lines backwards so the first completed line is the one left in `line`
+    masks = line_masks(size, win_length)
+    for index in range(len(masks) - 1, -1, -1):
+        mask = x_bits.dtype.type(masks[index])
+        x_line = (x_bits & mask) == mask
+        o_line = (o_bits & mask) == mask
+        np.putmask(line, x_line | o_line, index)
+        x_won |= x_line
+        o_won |= o_line
+
+    winner = np.zeros(count, dtype=np.int8)
+    has_line = line >= 0
+    if has_line.any():
+        first = np.array(masks, dtype=x_bits.dtype)[line[has_line]]
+        winner[has_line] = np.where((x_bits[has_line] & first) == first, 1, 2)
+
+    full = (x_bits | o_bits) == x_bits.dtype.type((1 << cells) - 1)
+    draw = ~has_line & full
+    status = np.where(has_line, STATUS_WIN, np.where(draw, STATUS_DRAW, STATUS_ONGOING)).astype(np.int8)
+
+    lead = np.bitwise_count(x_bits).astype(np.int8) - np.bitwise_count(o_bits).astype(np.int8)
+    parity_ok = (lead == 0) | (lead == 1)
+    both_won = x_won & o_won
+    # Codes other than 0, 1 and 2 (negative int8 codes become > 2 as uint8)
+    valid_cells = ~(positions.view(np.uint8) > 2).any(axis=1)
+    legal = (valid_cells & parity_ok & ~both_won
+             & ~(x_won & (lead != 1)) & ~(o_won & (lead != 0)))
+    return {
+        "winner": winner,
+        "line": line,
+        "draw": draw,
+        "status": status,
+        "parity_ok": parity_ok,
+        "both_won": both_won,
+        "legal": legal,
+    }
+
+
+def random_positions(count, size=3, seed=0, legal_only=False):
+    """(count, cells) int8 array of random positions: uniformly random cells, or with
+    `legal_only` random games of random length (X first, stopping at a win)"""
+    rng = np.random.default_rng(seed)
+    cells = size * size
+    if not legal_only:
+        return rng.integers(0, 3, size=(count, cells), dtype=np.int8)
+    win_length = backend.default_win_length(size)
+    moves = rng.permuted(np.tile(np.arange(cells), (count, 1)), axis=1)
+    lengths = rng.integers(0, cells + 1, size=count)
+    positions = np.zeros((count, cells), dtype=np.int8)
+    for ply in range(cells):
+        playing = lengths > ply
+        rows = np.nonzero(playing)[0]
+        positions[rows, moves[rows, ply]] = 1 + ply % 2
+        # Games end at the first win
+        finished = check_positions(positions[rows], win_length)["status"] == STATUS_WIN
+        lengths[rows[finished]] = np.minimum(lengths[rows[finished]], ply + 1)
+    return positions
+
+
+def _scalar_legal(board, win_length):
+    """Reference for check_positions()["legal"] on one 1D board"""
+    lead = board.count("X") - board.count("O")
+    x_won = o_won = False
+    for line in backend.win_lines(backend.board_size(board), win_length):
+        marks = {board[cell] for cell in line}
+        x_won = x_won or marks == {"X"}
+        o_won = o_won or marks == {"O"}
+    if lead not in (0, 1) or (x_won and o_won):
+        return False
+    return not (x_won and lead != 1) and not (o_won and lead != 0)
+
+
+def verify(count=20_000, seed=0):
+    """Compare check_positions with the scalar checks on random positions of every
+    geometry (arbitrary and legal ones). Returns the number of positions compared."""
+    from game import Board
+
+    checked = 0
+    for size, win_length in backend.GEOMETRIES:
+        for legal_only in (False, True):
+            positions = random_positions(count, size, seed, legal_only)
+            result = check_positions(positions, win_length)
+            lines = backend.win_lines(size, win_length)
+            for index, board in enumerate(decode(positions)):
+                expected = backend.check_result(board, win_length)
+                winner = " XO"[result["winner"][index]]
+                if expected["status"] == "win":
+                    ok = winner == expected["winner"] and lines[result["line"][index]] == expected["line"]
+                else:
+                    ok = result["line"][index] == -1 and bool(result["draw"][index]) == (expected["status"] == "draw")
+                grid = Board(size, win_length)
+                for cell, mark in enumerate(board):
+                    grid.board[cell // size][cell % size] = mark
+                scalar = grid.check_winner()
+                ok = ok and scalar == backend.check_winner_1d(board, win_length)
+                ok = ok and bool(result["legal"][index]) == _scalar_legal(board, win_length)
+                if legal_only:
+                    ok = ok and bool(result["legal"][index])
+                if not ok:
+                    raise AssertionError(f"mismatch on {board} ({size}x{size} k={win_length}): {expected}, "
+                                         f"bulk winner {winner!r} line {result['line'][index]}")
+                checked += 1
+    return checked
+
+
+def benchmark(count=2_000_000, seed=0):
+    """Rows of (geometry, positions per second of check_positions, of check_result)"""
+    rows = []
+    for size, win_length in backend.GEOMETRIES:
+        positions = random_positions(count, size, seed)
+        start = time.perf_counter()
+        check_positions(positions, win_length)
+        bulk_rate = count / (time.perf_counter() - start)
+        sample = decode(positions[:20_000])
+        start = time.perf_counter()
+        for board in sample:
+            backend.check_result(board, win_length)
+        scalar_rate = len(sample) / (time.perf_counter() - start)
+        rows.append((f"{size}x{size} k={win_length}", bulk_rate, scalar_rate))
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"{verify():,} positions match check_result, check_winner_1d and Board.check_winner")
+    print(f"{'geometry':<10} {'bulk/s':>12} {'scalar/s':>10} {'speedup':>8}")
+    for geometry, bulk_rate, scalar_rate in benchmark():
+        print(f"{geometry:<10} {bulk_rate:>12,.0f} {scalar_rate:>10,.0f} {bulk_rate / scalar_rate:>7.0f}x")
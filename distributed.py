@@ -0,0 +1,489 @@
+# Distributed Alpha-Beta: a coordinator splits the search near the root into work units
+# and sends them to worker processes over TCP
+
+"""
+Work units are the positions `split_depth` plies below the root (1 = one unit per root
+move). Each unit is searched with a full window (ttt_backend.score_line), so its score is
+exact and the coordinator backs the scores up with plain minimax. The move chosen is the
+first best root move in board order, the same move get_ai_move(..., "Alpha-Beta") returns.
+
+Protocol: every message is a 2-byte big-endian length followed by the body.
+  task    b"T" unit:u32 size:u8 win_length:u8 (0 = default) max_depth:i8 (-1 = none)
+          player:u8 (0 = X, 1 = O) ply:u8 evaluator:u8, then the board at 2 bits per cell
+  result  b"R" unit:u32 score:i32 nodes:u32
+  quit    b"Q" (stops the worker)
+A unit whose worker disconnects or does not answer within `unit_timeout` seconds goes
+back to the queue, and that worker is dropped for the rest of the search. Once the queue
+is empty, idle workers also take a copy of any unit that has run for more than
+`straggler_after` seconds; the first answer wins. If no worker is left, the coordinator
+searches the remaining units itself.
+
+    python distributed.py worker --port 9201
+    python distributed.py bench --workers 1 2 4
+"""
+
+import argparse
+import itertools
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import tactics
+import ttt_backend as backend
+from evaluation import LineEvaluator
+
+_LENGTH = struct.Struct("!H")
+_TASK = struct.Struct("!cIBBbBBB")
+_RESULT = struct.Struct("!cIiI")
+_CELL_CODES = {" ": 0, "X": 1, "O": 2}
+_MARKS = " XO"
+
+
+class ProtocolError(Exception):
+    """Malformed or unexpected message"""
+
+
+# - Encoding
+def pack_cells(board):
+    """Board as bytes, 2 bits per cell (7 bytes for 5x5)"""
+    data = bytearray((len(board) + 3) // 4)
+    for cell, mark in enumerate(board):
+        data[cell >> 2] |= _CELL_CODES[mark] << ((cell & 3) * 2)
+    return bytes(data)
+
+
+def unpack_cells(data, cells):
+    return [_MARKS[(data[cell >> 2] >> ((cell & 3) * 2)) & 3] for cell in range(cells)]
+
+
+def encode_task(unit_id, board, player, ply, win_length=None, max_depth=None, use_evaluator=False):
+    return _TASK.pack(b"T", unit_id, backend.board_size(board), win_length or 0,
+                      -1 if max_depth is None else max_depth, player == "O", ply,
+                      bool(use_evaluator)) + pack_cells(board)
+
+
+def decode_task(body):
+    """Return (unit_id, board, player, ply, win_length, max_depth, use_evaluator)"""
+    kind, unit_id, size, win_length, max_depth, o_player, ply, use_evaluator = _TASK.unpack_from(body)
+    if kind != b"T":
+        raise ProtocolError(f"expected a task, got {kind!r}")
+    board = unpack_cells(body[_TASK.size:], size * size)
+    return (unit_id, board, "O" if o_player else "X", ply, win_length or None,
+            None if max_depth < 0 else max_depth, bool(use_evaluator))
+
+
+def _send(sock, body):
+    sock.sendall(_LENGTH.pack(len(body)) + body)
+
+
+def _recv_exact(sock, count):
+    data = bytearray()
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def _recv(sock):
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, length)
+
+
+# - Worker
+def serve_worker(port, host="127.0.0.1"):
+    """Answer work units from one coordinator connection at a time, until a quit message"""
+    evaluators = {}
+    with socket.create_server((host, port)) as server:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    while True:
+                        body = _recv(conn)
+                        if body[:1] == b"Q":
+                            return
+                        unit_id, board, player, ply, win_length, max_depth, use_evaluator = decode_task(body)
+                        evaluator = None
+                        if use_evaluator:
+                            key = (len(board), win_length)
+                            evaluator = evaluators.get(key)
+                            if evaluator is None:
+                                evaluator = evaluators[key] = LineEvaluator(backend.board_size(board), win_length)
+                        score, nodes = backend.score_line(board, player, ply, win_length, max_depth, evaluator)
+                        _send(conn, _RESULT.pack(b"R", unit_id, score, nodes))
+                except (OSError, ProtocolError, struct.error):
+                    continue  # coordinator went away; wait for the next one
+
+
+# - Coordinator
+class _Unit:
+    def __init__(self, unit_id, line, task):
+        self.id = unit_id
+        self.line = line
+        self.task = task
+        self.started = None
+        self.assigned = []  # worker addresses that received the unit
+        self.done = False
+
+
+class _Dispatch:
+    """Shared queue state of one distributed search (guarded by cond)"""
+
+    def __init__(self, units, straggler_after):
+        self.cond = threading.Condition()
+        self.pending = list(units)
+        self.running = []
+        self.remaining = len(units)
+        self.straggler_after = straggler_after
+        self.live = 0
+        self.scores = {}
+        self.nodes = 0
+        self.redispatched = 0
+        self.duplicates = 0
+        self.local_units = 0
+        self.units_by_worker = {}
+
+    def finished(self):
+        return self.remaining == 0
+
+    def next_unit(self, address):
+        if self.pending:
+            unit = self.pending.pop(0)
+        else:
+            now = time.perf_counter()
+            unit = next((u for u in self.running
+                         if not u.done and len(u.assigned) < 2 and address not in u.assigned
+                         and now - u.started > self.straggler_after), None)
+            if unit is None:
+                return None
+            self.duplicates += 1
+        if unit.started is None:
+            unit.started = time.perf_counter()
+            self.running.append(unit)
+        unit.assigned.append(address)
+        return unit
+
+    def complete(self, unit, score, nodes, worker):
+        self.nodes += nodes
+        if unit.done:
+            return
+        unit.done = True
+        self.remaining -= 1
+        self.scores[unit.line] = score
+        self.units_by_worker[worker] = self.units_by_worker.get(worker, 0) + 1
+
+    def fail(self, unit, address):
+        unit.assigned.remove(address)
+        if not unit.done and not unit.assigned and unit not in self.pending:
+            self.pending.insert(0, unit)
+            self.redispatched += 1
+
+
+class Coordinator:
+    """
+    Distributed replacement for get_ai_move(..., "Alpha-Beta").
+    `workers` is a list of (host, port) addresses of running workers; connections are
+    opened on first use and kept between searches.
+    """
+
+    def __init__(self, workers, split_depth=1, unit_timeout=30.0, straggler_after=2.0,
+                 connect_timeout=2.0):
+        if split_depth < 1:
+            raise ValueError("split_depth must be at least 1")
+        self.workers = [tuple(address) for address in workers]
+        self.split_depth = split_depth
+        self.unit_timeout = unit_timeout
+        self.straggler_after = straggler_after
+        self.connect_timeout = connect_timeout
+        self._connections = {}
+        self._unit_ids = itertools.count(1)
+
+    def _connect(self, address):
+        sock = self._connections.get(address)
+        if sock is None:
+            try:
+                sock = socket.create_connection(address, timeout=self.connect_timeout)
+            except OSError:
+                return None
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connections[address] = sock
+        return sock
+
+    def _drop(self, address):
+        sock = self._connections.pop(address, None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def close(self):
+        for address in list(self._connections):
+            self._drop(address)
+
+    def shutdown_workers(self):
+        """Send the quit message to every worker"""
+        for address in self.workers:
+            sock = self._connect(address)
+            if sock is not None:
+                try:
+                    _send(sock, b"Q")
+                except OSError:
+                    pass
+            self._drop(address)
+
+    def _expand(self, board, player, win_length):
+        """Lines of up to split_depth moves from the root (shorter where the game ends)"""
+        lines = []
+        children = {}
+
+        def walk(line, to_move):
+            if len(line) == self.split_depth or backend.check_result(board, win_length)["status"] != "ongoing":
+                lines.append(tuple(line))
+                return
+            moves = backend.available_moves(board)
+            children[tuple(line)] = moves
+            opponent = "O" if to_move == "X" else "X"
+            for move in moves:
+                board[move] = to_move
+                walk(line + [move], opponent)
+                board[move] = " "
+
+        board = list(board)
+        walk([], player)
+        return lines, children
+
+    def _worker_loop(self, address, sock, state):
+        try:
+            while True:
+                with state.cond:
+                    unit = None
+                    while unit is None:
+                        if state.finished():
+                            return
+                        unit = state.next_unit(address)
+                        if unit is None:
+                            state.cond.wait(0.05)
+                try:
+                    sock.settimeout(self.unit_timeout)
+                    _send(sock, unit.task)
+                    kind, unit_id, score, nodes = _RESULT.unpack(_recv(sock))
+                    if kind != b"R" or unit_id != unit.id:
+                        raise ProtocolError(f"unexpected reply {kind!r} for unit {unit_id}")
+                except (OSError, ProtocolError, struct.error):
+                    with state.cond:
+                        state.fail(unit, address)
+                        state.cond.notify_all()
+                    self._drop(address)
+                    return
+                with state.cond:
+                    state.complete(unit, score, nodes, "%s:%d" % address)
+                    state.cond.notify_all()
+        finally:
+            with state.cond:
+                state.live -= 1
+                state.cond.notify_all()
+
+    def _run(self, units, searches, evaluator):
+        """Search every unit on the workers (or locally once none is left)"""
+        state = _Dispatch(units, self.straggler_after)
+        threads = {}
+        for address in self.workers:
+            sock = self._connect(address)
+            if sock is not None:
+                threads[address] = threading.Thread(target=self._worker_loop, args=(address, sock, state),
+                                                    name="ttt-dispatch", daemon=True)
+        state.live = len(threads)
+        for thread in threads.values():
+            thread.start()
+
+        while True:
+            with state.cond:
+                while not state.finished() and state.live > 0:
+                    state.cond.wait(0.1)
+                if state.finished():
+                    break
+                unit = state.pending.pop(0) if state.pending else None
+            if unit is None:
+                continue
+            board, player, ply, win_length, max_depth = searches[unit.id]
+            score, nodes = backend.score_line(board, player, ply, win_length, max_depth, evaluator)
+            with state.cond:
+                state.local_units += 1
+                state.complete(unit, score, nodes, "local")
+
+        # Workers still busy on a duplicate are disconnected so their late answer is never read
+        for address, thread in threads.items():
+            thread.join(0.05)
+            if thread.is_alive():
+                self._drop(address)
+                thread.join()
+        state.workers = len(threads)
+        return state
+
+    def get_move(self, board, player, win_length=None, max_depth=None, use_evaluator=None,
+                 forced_moves=True):
+        """
+        Same move as get_ai_move(board, player, "Alpha-Beta", win_length=..., max_depth=...,
+        evaluator=LineEvaluator(...) if use_evaluator), searched on the workers.
+        `use_evaluator` defaults to True for depth-limited searches.
+        Returns (move_index, metrics).
+        """
+        start = time.perf_counter()
+        if backend.check_winner_1d(board, win_length) is not None:
+            return 0, {"nodes": 0, "units": 0}
+        if forced_moves:
+            move, tactic = tactics.find_forced_move(board, player, win_length)
+            if move is not None:
+                return move, {"nodes": 0, "units": 0, "tactic": tactic,
+                              "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 3)}
+        if use_evaluator is None:
+            use_evaluator = max_depth is not None
+        evaluator = None
+        if use_evaluator:
+            evaluator = LineEvaluator(backend.board_size(board), win_length)
+
+        lines, children = self._expand(board, player, win_length)
+        opponent = "O" if player == "X" else "X"
+        units = []
+        searches = {}
+        for line in lines:
+            unit_board = list(board)
+            for ply, move in enumerate(line):
+                unit_board[move] = player if ply % 2 == 0 else opponent
+            unit_id = next(self._unit_ids)
+            units.append(_Unit(unit_id, line, encode_task(unit_id, unit_board, player, len(line),
+                                                           win_length, max_depth, use_evaluator)))
+            searches[unit_id] = (unit_board, player, len(line), win_length, max_depth)
+        state = self._run(units, searches, evaluator)
+
+        def backed_up(line, maximizing):
+            if line in state.scores:
+                return state.scores[line]
+            values = [backed_up(line + (move,), not maximizing) for move in children[line]]
+            return max(values) if maximizing else min(values)
+
+        best_score = float('-inf')
+        best_move = None
+        for move in children[()]:
+            score = backed_up((move,), False)
+            if score > best_score:
+                best_score = score
+                best_move = move
+
+        metrics = {
+            "nodes": state.nodes,
+            "units": len(units),
+            "workers": state.workers,
+            "units_by_worker": state.units_by_worker,
+            "redispatched": state.redispatched,
+            "duplicates": state.duplicates,
+            "local_units": state.local_units,
+            "score": best_score,
+            "tactic": None,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 3),
+        }
+        return best_move, metrics
+
+
+# - Local cluster helpers and scaling benchmark
+def start_local_workers(count, base_port=9300, wait=10.0):
+    """Start `count` worker processes on localhost; returns (processes, addresses)"""
+    script = os.path.abspath(__file__)
+    addresses = [("127.0.0.1", base_port + i) for i in range(count)]
+    processes = [subprocess.Popen([sys.executable, script, "worker", "--port", str(port)])
+                 for _, port in addresses]
+    deadline = time.monotonic() + wait
+    for address in addresses:
+        while True:
+            try:
+                socket.create_connection(address, timeout=0.5).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    stop_local_workers(processes)
+                    raise RuntimeError(f"worker at {address[0]}:{address[1]} did not start")
+                time.sleep(0.05)
+    return processes, addresses
+
+
+def stop_local_workers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def benchmark(worker_counts=(1, 2, 4), size=4, opening=(0, 5), split_depth=1, base_port=9300):
+    """
+    Time one depth-limited search after `opening` on the single-process engine and on
+    1..N local workers. Returns rows of
+    (workers, move, elapsed_s, nodes, speedup vs single process, efficiency = speedup / workers).
+    """
+    win_length = backend.default_win_length(size)
+    max_depth = backend.default_search_depth(size)
+    board = backend.new_board(size)
+    player = "X"
+    for move in opening:
+        board = backend.place(board, move, player)
+        player = "O" if player == "X" else "X"
+
+    evaluator = LineEvaluator(size, win_length) if max_depth is not None else None
+    start = time.perf_counter()
+    move, metrics = backend.get_ai_move(board, player, "Alpha-Beta", win_length=win_length,
+                                        max_depth=max_depth, evaluator=evaluator, forced_moves=False)
+    single = time.perf_counter() - start
+    rows = [(0, move, single, metrics["nodes"], 1.0, 1.0)]
+
+    for count in worker_counts:
+        processes, addresses = start_local_workers(count, base_port)
+        coordinator = Coordinator(addresses, split_depth=split_depth)
+        try:
+            start = time.perf_counter()
+            dmove, dmetrics = coordinator.get_move(board, player, win_length, max_depth, forced_moves=False)
+            elapsed = time.perf_counter() - start
+        finally:
+            coordinator.close()
+            stop_local_workers(processes)
+        if dmove != move:
+            raise AssertionError(f"distributed move {dmove} != single-process move {move}")
+        speedup = single / elapsed
+        rows.append((count, dmove, elapsed, dmetrics["nodes"], speedup, speedup / count))
+        base_port += count
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed Alpha-Beta worker and scaling benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="serve work units")
+    worker.add_argument("--host", default="127.0.0.1")
+    worker.add_argument("--port", type=int, default=9201)
+    bench = commands.add_parser("bench", help="measure scaling with local worker processes")
+    bench.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    bench.add_argument("--size", type=int, default=4, choices=[size for size, _ in backend.GEOMETRIES])
+    bench.add_argument("--split-depth", type=int, default=1)
+    bench.add_argument("--port", type=int, default=9300, help="first worker port")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        serve_worker(args.port, args.host)
+        return
+    rows = benchmark(args.workers, args.size, split_depth=args.split_depth, base_port=args.port)
+    print(f"{args.size}x{args.size}, {os.cpu_count()} CPU(s) on this host")
+    print(f"{'workers':>8} {'move':>5} {'time (s)':>9} {'nodes':>9} {'speedup':>8} {'efficiency':>10}")
+    for count, move, elapsed, nodes, speedup, efficiency in rows:
+        label = "single" if count == 0 else str(count)
+        print(f"{label:>8} {move:>5} {elapsed:>9.3f} {nodes:>9} {speedup:>8.2f} {efficiency:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
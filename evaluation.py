@@ -0,0 +1,159 @@
+# Heuristic line-threat evaluation for depth-limited search
+
+"""
+LineEvaluator keeps, for every winning line, how many X and O marks it holds.
+Making or undoing a move only touches the lines through that cell, so the
+running score is updated in O(lines through the cell) instead of rescanning
+the board. A line that holds marks of only one player is "open" for that
+player and is worth weights[count]; a line holding both marks is dead.
+
+The engines call place/remove alongside their own make/undo and use score()
+at the depth limit (see ttt_backend.get_ai_move and ai.AIPlayer).
+"""
+
+import random
+import time
+
+from ttt_backend import MATE_BOUND, win_lines
+
+# Leaf scores are clamped inside the range reserved for heuristic scores
+EVAL_LIMIT = MATE_BOUND
+
+_MARK_INDEX = {"X": 0, "O": 1}
+
+
+def default_weights(win_length):
+    """Weight of an open line by number of marks: 0, 1, 4, 16, ... (a completed line is a win)"""
+    return tuple(0 if count == 0 else 4 ** (count - 1) for count in range(win_length))
+
+
+class LineEvaluator:
+    """Incremental open-line / threat evaluator for one board geometry"""
+
+    def __init__(self, size=3, win_length=None, weights=None):
+        self.lines = win_lines(size, win_length)
+        self.size = size
+        self.win_length = len(self.lines[0])
+        self.weights = tuple(weights) if weights is not None else default_weights(self.win_length)
+        if len(self.weights) < self.win_length:
+            raise ValueError(f"need {self.win_length} weights (one per mark count below a win)")
+        self.cell_lines = [[] for _ in range(size * size)]
+        for index, line in enumerate(self.lines):
+            for cell in line:
+                self.cell_lines[cell].append(index)
+        self.reset()
+
+    def reset(self, board=None):
+        """Clear the counts, then load the marks of a 1D board if one is given"""
+        self.counts = [[0] * len(self.lines), [0] * len(self.lines)]
+        self.total = 0  # from X's point of view
+        if board is not None:
+            for cell, mark in enumerate(board):
+                if mark != " ":
+                    self.place(cell, mark)
+
+    def _line_value(self, x_count, o_count):
+        if x_count and o_count:
+            return 0
+        if x_count:
+            return self.weights[x_count] if x_count < self.win_length else 0
+        if o_count:
+            return -self.weights[o_count] if o_count < self.win_length else 0
+        return 0
+
+    def place(self, cell, mark):
+        """Update the lines through cell for a new mark"""
+        mine = self.counts[_MARK_INDEX[mark]]
+        x_counts, o_counts = self.counts
+        value = self._line_value
+        total = self.total
+        for index in self.cell_lines[cell]:
+            total -= value(x_counts[index], o_counts[index])
+            mine[index] += 1
+            total += value(x_counts[index], o_counts[index])
+        self.total = total
+
+    def remove(self, cell, mark):
+        """Undo place(cell, mark)"""
+        mine = self.counts[_MARK_INDEX[mark]]
+        x_counts, o_counts = self.counts
+        value = self._line_value
+        total = self.total
+        for index in self.cell_lines[cell]:
+            total -= value(x_counts[index], o_counts[index])
+            mine[index] -= 1
+            total += value(x_counts[index], o_counts[index])
+        self.total = total
+
+    def score(self, player):
+        """Current evaluation from player's point of view, clamped to +/-EVAL_LIMIT"""
+        total = self.total if player == "X" else -self.total
+        return max(-EVAL_LIMIT, min(EVAL_LIMIT, total))
+
+
+def evaluate_full(board, player, size=3, win_length=None, weights=None):
+    """Reference evaluation that rescans every line of a 1D board (same result as LineEvaluator)"""
+    lines = win_lines(size, win_length)
+    k = len(lines[0])
+    if weights is None:
+        weights = default_weights(k)
+    total = 0
+    for line in lines:
+        x_count = o_count = 0
+        for cell in line:
+            mark = board[cell]
+            if mark == "X":
+                x_count += 1
+            elif mark == "O":
+                o_count += 1
+        if x_count and not o_count and x_count < k:
+            total += weights[x_count]
+        elif o_count and not x_count and o_count < k:
+            total -= weights[o_count]
+    if player != "X":
+        total = -total
+    return max(-EVAL_LIMIT, min(EVAL_LIMIT, total))
+
+
+def benchmark(size=5, win_length=4, games=200, seed=0):
+    """Evaluations per second of the incremental evaluator vs a full rescan, over random games"""
+    rng = random.Random(seed)
+    games_moves = []
+    for _ in range(games):
+        cells = list(range(size * size))
+        rng.shuffle(cells)
+        games_moves.append(cells[:rng.randint(size, size * size)])
+
+    evaluator = LineEvaluator(size, win_length)
+    evaluations = 0
+    start = time.perf_counter()
+    for moves in games_moves:
+        evaluator.reset()
+        mark = "X"
+        for cell in moves:
+            evaluator.place(cell, mark)
+            evaluator.score("X")
+            evaluations += 1
+            mark = "O" if mark == "X" else "X"
+        for cell in reversed(moves):
+            mark = "O" if mark == "X" else "X"
+            evaluator.remove(cell, mark)
+    incremental = evaluations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for moves in games_moves:
+        board = [" "] * (size * size)
+        mark = "X"
+        for cell in moves:
+            board[cell] = mark
+            evaluate_full(board, "X", size, win_length)
+            mark = "O" if mark == "X" else "X"
+    full = evaluations / (time.perf_counter() - start)
+    return incremental, full
+
+
+if __name__ == "__main__":
+    for size, win_length in [(3, 3), (4, 4), (5, 4)]:
+        incremental, full = benchmark(size, win_length)
+        print(f"{size}x{size} k={win_length}: incremental {incremental:,.0f} evals/s, "
+              f"full rescan {full:,.0f} evals/s ({incremental / full:.1f}x)")
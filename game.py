@@ -1,75 +1,95 @@
 # Game logic for Tic Tac Toe implementation
 
+import ttt_backend
+
+_WIN_LINES_CACHE = {}
+
+def get_win_lines(size, win_length):
+    """Return all winning lines of a size x size board as tuples of (row, col) cells,
+    in ttt_backend.win_lines order; converted once per geometry."""
+    lines = _WIN_LINES_CACHE.get((size, win_length))
+    if lines is None:
+        lines = tuple(tuple(divmod(idx, size) for idx in line)
+                      for line in ttt_backend.win_lines(size, win_length))
+        _WIN_LINES_CACHE[(size, win_length)] = lines
+    return lines
+
 class Board:
-    def __init__(self):
-        # Initialize empty 3x3 board
-        self.board = [[' ' for _ in range(3)] for _ in range(3)]
-        self.size = 3
-        
+    def __init__(self, size=3, win_length=None):
+        # Initialize empty size x size board; win_length defaults to 3 on 3x3 and 4 on bigger boards
+        if win_length is None:
+            win_length = min(size, 4)
+        if not 1 <= win_length <= size:
+            raise ValueError(f"win_length must be between 1 and {size}")
+        self.size = size
+        self.win_length = win_length
+        self.win_lines = get_win_lines(size, win_length)
+        self.board = [[' ' for _ in range(size)] for _ in range(size)]
+
     def display(self):
         """Display the current board state"""
-        print("\n   0   1   2")
+        print("\n   " + "   ".join(str(c) for c in range(self.size)))
         for i in range(self.size):
-            print(f"{i}  {self.board[i][0]} | {self.board[i][1]} | {self.board[i][2]}")
+            print(f"{i}  " + " | ".join(self.board[i]))
             if i < self.size - 1:
-                print("  -----------")
-    
+                print("  " + "-" * (4 * self.size - 1))
+
     def is_valid_move(self, row, col):
         """Check if a move is valid (within bounds and cell is empty)"""
         return 0 <= row < self.size and 0 <= col < self.size and self.board[row][col] == ' '
-    
+
     def make_move(self, row, col, player):
         """Make a move on the board if it's valid"""
         if self.is_valid_move(row, col):
             self.board[row][col] = player
             return True
         return False
-    
+
     def undo_move(self, row, col):
         """Undo a move by clearing the cell"""
         if 0 <= row < self.size and 0 <= col < self.size:
             self.board[row][col] = ' '
-    
+
     def check_winner(self):
         """Check if there's a winner or if it's a draw
         Returns: 'X' if X wins, 'O' if O wins, 'Draw' if no winner, None if game continues
         """
-        # Check rows
-        for row in self.board:
-            if row[0] == row[1] == row[2] != ' ':
-                return row[0]
-        
-        # Check columns
-        for col in range(3):
-            if self.board[0][col] == self.board[1][col] == self.board[2][col] != ' ':
-                return self.board[0][col]
-        
-        # Check diagonals
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] != ' ':
-            return self.board[0][0]
-        if self.board[0][2] == self.board[1][1] == self.board[2][0] != ' ':
-            return self.board[0][2]
-        
+        board = self.board
+        # Check rows, columns and diagonals
+        for line in self.win_lines:
+            r, c = line[0]
+            first = board[r][c]
+            if first == ' ':
+                continue
+            for r, c in line:
+                if board[r][c] != first:
+                    break
+            else:
+                return first
+
         # Check for draw (board full)
-        is_board_full = all(self.board[i][j] != ' ' for i in range(3) for j in range(3))
-        if is_board_full:
+        if self.is_board_full():
             return 'Draw'
-            
+
         return None  # Game continues
-    
+
     def get_empty_cells(self):
         """Get list of empty cells as (row, col) tuples"""
         empty_cells = []
-        for i in range(3):
-            for j in range(3):
+        for i in range(self.size):
+            for j in range(self.size):
                 if self.board[i][j] == ' ':
                     empty_cells.append((i, j))
         return empty_cells
-    
+
+    def to_list(self):
+        """Return the cells as a flat row-major list (the 1D format used by ttt_backend)"""
+        return [cell for row in self.board for cell in row]
+
     def is_board_full(self):
         """Check if the board is full"""
-        return all(self.board[i][j] != ' ' for i in range(3) for j in range(3))
-    
+        return all(' ' not in row for row in self.board)
+
     def reset(self):
         """Reset the board to initial state"""
-        self.board = [[' ' for _ in range(3)] for _ in range(3)]
+        self.board = [[' ' for _ in range(self.size)] for _ in range(self.size)]
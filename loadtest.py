@@ -0,0 +1,299 @@
+# Load-test harness: simulates concurrent Streamlit sessions playing games
+
+"""
+Each simulated session drives `streamlit_app.py` through Streamlit's AppTest, which
+executes the script exactly as a server would on every rerun but without needing a
+browser or a network. A session plays several Human vs AI or AI vs AI games and times
+every rerun.
+
+Two models:
+  processes (default)  one process per session: CPU time and memory per session
+  threads (--threads)  every session as a thread of one process, like a Streamlit
+                       server; the latency percentiles include GIL and CPU contention
+
+Memory is reported as the peak RSS over the idle baseline: a process that has
+imported the app's dependencies (Streamlit, pandas, the engines) but runs no session.
+A server pays that baseline once, not per session.
+
+Usage:
+    python loadtest.py --sessions 8 --games 2 --mode mixed
+    python loadtest.py --sessions 8 --games 2 --threads
+"""
+
+import argparse
+import ast
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+# Loaded by Streamlit itself the first time a session renders a table or chart
+LAZY_DEPENDENCIES = ("streamlit.testing.v1", "pyarrow")
+MODES = ("Human vs AI", "AI vs AI")
+ALGORITHMS = ("Minimax", "Alpha-Beta")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class SessionDriver:
+    """Plays games through one AppTest instance and records rerun latencies"""
+
+    def __init__(self, mode, algo_x, algo_o, rng, ai_delay=0.0, board="3x3", timeout=120):
+        from streamlit.testing.v1 import AppTest
+
+        self.mode = mode
+        self.rng = rng
+        self.latencies = []
+        self.at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.at.session_state["speed"] = ai_delay  # auto-play pause between AI moves
+        self._run(self.at)
+        self._run(self._selectbox("Game mode").select(mode))
+        self._run(self._selectbox("Board").select(board))
+        self._run(self._selectbox("Algorithm for X").select(algo_x))
+        self._run(self._selectbox("Algorithm for O").select(algo_o))
+
+    def _run(self, element):
+        start = time.perf_counter()
+        element.run()
+        self.latencies.append((time.perf_counter() - start) * 1000.0)
+        if self.at.exception:
+            raise RuntimeError(f"app raised: {self.at.exception[0].message}")
+
+    def _selectbox(self, label):
+        for selectbox in self.at.sidebar.selectbox:
+            if selectbox.label == label:
+                return selectbox
+        raise LookupError(f"no selectbox labeled {label!r}")
+
+    def _button(self, label):
+        for button in self.at.button:
+            if button.label == label:
+                return button
+        raise LookupError(f"no button labeled {label!r}")
+
+    def play_game(self):
+        """Play one game to the end and return the number of reruns it took"""
+        reruns_before = len(self.latencies)
+        self._run(self.at.button(key="restart").click())
+        if self.mode == "AI vs AI":
+            self._run(self._button("▶️ Start Auto-Play").click())
+        guard = 0
+        while not self.at.session_state["game_over"] and guard < 50:
+            guard += 1
+            if self.mode == "AI vs AI":
+                self._run(self.at)
+                continue
+            board = self.at.session_state["board"]
+            empty = [i for i, v in enumerate(board) if v == " "]
+            self._run(self.at.button(key=f"cell_{self.rng.choice(empty)}").click())
+        return len(self.latencies) - reruns_before
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def load_app_dependencies():
+    """Import every module streamlit_app.py imports (also inside functions), AppTest and
+    LAZY_DEPENDENCIES, without running a session. Returns the idle baseline: the peak
+    RSS after the imports, in MB."""
+    with open(APP_FILE) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            importlib.import_module(name)
+    for name in LAZY_DEPENDENCIES:
+        importlib.import_module(name)
+    return peak_rss_mb()
+
+
+def play_session(session_id, mode, games, seed, ai_delay, board):
+    """Play the requested games in one session and return its stats"""
+    rng = random.Random(seed)
+    algo_x, algo_o = rng.choice(ALGORITHMS), rng.choice(ALGORITHMS)
+    wall_start = time.perf_counter()
+    driver = SessionDriver(mode, algo_x, algo_o, rng, ai_delay, board)
+    for _ in range(games):
+        driver.play_game()
+    return {
+        "session": session_id,
+        "mode": mode,
+        "algorithms": f"X:{algo_x} O:{algo_o}",
+        "reruns": len(driver.latencies),
+        "latencies_ms": driver.latencies,
+        "wall_s": time.perf_counter() - wall_start,
+    }
+
+
+def run_session(args):
+    """Process worker entry point: one session in a fresh process, with its CPU time and
+    its peak RSS over the idle baseline"""
+    baseline_mb = load_app_dependencies()
+    cpu_start = time.process_time()
+    result = play_session(*args)
+    result["cpu_s"] = time.process_time() - cpu_start
+    result["baseline_mb"] = baseline_mb
+    result["rss_delta_mb"] = peak_rss_mb() - baseline_mb
+    return result
+
+
+@contextlib.contextmanager
+def shared_test_runtime():
+    """
+    AppTest installs a mock Streamlit Runtime singleton and a config patch for every run
+    and removes them when the run ends, which breaks runs in other threads. While this
+    is active, the first run's runtime stays installed and is shared by every session
+    (as one server's runtime is), and the config patch is applied once.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import patch_config_options
+
+    class SharedRuntimeType(type):
+        @property
+        def _instance(cls):
+            return Runtime._instance
+
+        @_instance.setter
+        def _instance(cls, value):
+            if Runtime._instance is None:
+                Runtime._instance = value
+
+    shared_runtime = SharedRuntimeType("SharedRuntime", (Runtime,), {})
+    app_test.Runtime = shared_runtime
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        app_test.Runtime = Runtime
+        app_test.patch_config_options = patch_config_options
+        Runtime._instance = None
+
+
+def run_threaded(jobs):
+    """Run every session as a thread of this process, as a Streamlit server does.
+    CPU time and the RSS delta are only known for the whole process, so each session
+    is given an equal share."""
+    baseline_mb = load_app_dependencies()
+    cpu_start = time.process_time()
+    with shared_test_runtime(), ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(lambda job: play_session(*job), jobs))
+    cpu_s = time.process_time() - cpu_start
+    rss_delta_mb = peak_rss_mb() - baseline_mb
+    for result in results:
+        result["cpu_s"] = cpu_s / len(results)
+        result["baseline_mb"] = baseline_mb
+        result["rss_delta_mb"] = rss_delta_mb / len(results)
+    return results
+
+
+def summarize(results, wall_s, model="processes"):
+    """Aggregate per-session stats into a report dict"""
+    latencies = [ms for r in results for ms in r["latencies_ms"]]
+    report = {
+        "model": model,
+        "sessions": len(results),
+        "reruns": len(latencies),
+        "wall_s": round(wall_s, 3),
+        "reruns_per_s": round(len(latencies) / wall_s, 2) if wall_s > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p90": round(percentile(latencies, 90), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        },
+        "cpu_s_per_session": round(statistics.fmean(r["cpu_s"] for r in results), 3),
+        "baseline_rss_mb": round(max(r["baseline_mb"] for r in results), 1),
+        "rss_delta_mb_per_session": round(max(r["rss_delta_mb"] for r in results), 1),
+        "by_mode": {},
+    }
+    for mode in MODES:
+        mode_latencies = [ms for r in results if r["mode"] == mode for ms in r["latencies_ms"]]
+        if mode_latencies:
+            report["by_mode"][mode] = {
+                "p50": round(percentile(mode_latencies, 50), 2),
+                "p99": round(percentile(mode_latencies, 99), 2),
+            }
+    return report
+
+
+def print_report(report, results):
+    print(f"Sessions: {report['sessions']} ({report['model']})   reruns: {report['reruns']}   "
+          f"wall: {report['wall_s']} s   throughput: {report['reruns_per_s']} reruns/s")
+    lat = report["latency_ms"]
+    print(f"Rerun latency (ms): p50 {lat['p50']}  p90 {lat['p90']}  p99 {lat['p99']}  "
+          f"max {lat['max']}  mean {lat['mean']}")
+    for mode, stats in report["by_mode"].items():
+        print(f"  {mode:<12} p50 {stats['p50']} ms  p99 {stats['p99']} ms")
+    print(f"CPU per session: {report['cpu_s_per_session']} s   "
+          f"peak RSS per session: +{report['rss_delta_mb_per_session']} MB "
+          f"over the {report['baseline_rss_mb']} MB idle baseline")
+    print()
+    print(f"{'session':>7}  {'mode':<12} {'algorithms':<28} {'reruns':>6} {'p50 ms':>8} {'cpu s':>7} {'+rss MB':>7}")
+    for r in results:
+        print(f"{r['session']:>7}  {r['mode']:<12} {r['algorithms']:<28} {r['reruns']:>6} "
+              f"{percentile(r['latencies_ms'], 50):>8.1f} {r['cpu_s']:>7.2f} {r['rss_delta_mb']:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for streamlit_app.py")
+    parser.add_argument("--sessions", type=int, default=4, help="number of concurrent sessions")
+    parser.add_argument("--games", type=int, default=2, help="games played per session")
+    parser.add_argument("--mode", choices=["mixed", "human-vs-ai", "ai-vs-ai"], default="mixed")
+    parser.add_argument("--ai-delay", type=float, default=0.0,
+                        help="auto-play pause between AI moves in seconds (the app default is 0.4)")
+    parser.add_argument("--board", default="3x3", help='board option as labeled in the app, e.g. "4x4"')
+    parser.add_argument("--threads", action="store_true",
+                        help="run the sessions as threads of one process (a single server) instead of processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    if args.mode == "mixed":
+        modes = [MODES[i % 2] for i in range(args.sessions)]
+    else:
+        modes = [MODES[0] if args.mode == "human-vs-ai" else MODES[1]] * args.sessions
+    jobs = [(i, modes[i], args.games, args.seed + i, args.ai_delay, args.board) for i in range(args.sessions)]
+
+    if args.threads:
+        # Import before the clock starts, as a running server already has
+        load_app_dependencies()
+        start = time.perf_counter()
+        results = run_threaded(jobs)
+    else:
+        start = time.perf_counter()
+        # One process per session so CPU time and peak memory are measured per session
+        with multiprocessing.Pool(processes=args.sessions, maxtasksperchild=1) as pool:
+            results = pool.map(run_session, jobs)
+    report = summarize(results, time.perf_counter() - start, "threads" if args.threads else "processes")
+    print_report(report, results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"report": report, "sessions": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
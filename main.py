@@ -1,26 +1,69 @@
 # Main application for Tic Tac Toe game with AI
 
+import argparse
+
+import metrics
 from game import Board
 from ai import AIPlayer
+from evaluation import LineEvaluator
+from opening_book import load_book
+from session import EngineSession
+from ttt_backend import GEOMETRIES, default_search_depth
 
 class Game:
-    def __init__(self):
+    def __init__(self, profile_memory=False):
         self.board = Board()
+        self.profile_memory = profile_memory  # report the memory used by each AI search
         self.current_player = 'X'
         self.game_mode = None
         self.ai_players = {}
         self.game_over = False
+        self.session = EngineSession()  # search state the AI players reuse between moves
         
     def set_game_mode(self, mode):
         """Set the game mode (human_vs_human, human_vs_ai, ai_vs_ai)"""
         self.game_mode = mode
         
+    def choose_board(self):
+        """Ask for the board size and win length"""
+        print("\nBoard Options:")
+        for i, (size, win_length) in enumerate(GEOMETRIES, 1):
+            print(f"{i}. {size}x{size}, {win_length} in a row")
+        while True:
+            try:
+                choice = int(input(f"Select board (1-{len(GEOMETRIES)}): "))
+                if 1 <= choice <= len(GEOMETRIES):
+                    size, win_length = GEOMETRIES[choice - 1]
+                    self.board = Board(size, win_length)
+                    return
+                print(f"Please select 1-{len(GEOMETRIES)}")
+            except ValueError:
+                print("Invalid input!")
+    
+    def new_ai_player(self, algorithm, symbol):
+        """Create an AI player with the search depth suited to the current board
+        (Auto chooses its own depth for every move)"""
+        max_depth = default_search_depth(self.board.size) if algorithm != 'auto' else None
+        evaluator = None
+        if max_depth is not None:
+            evaluator = LineEvaluator(self.board.size, self.board.win_length)
+        return AIPlayer(algorithm=algorithm, player_symbol=symbol,
+                        max_depth=max_depth, evaluator=evaluator, session=self.session,
+                        profile_memory=self.profile_memory,
+                        book=load_book(self.board.size, self.board.win_length))
+        
     def start_new_game(self):
         """Start a new game with reset board and state"""
         self.board.reset()
         self.current_player = 'X'
         self.game_over = False
+        self.session = EngineSession(self.board.size, self.board.win_length)
         print("New game started!")
+    
+    def play_move(self, row, col):
+        """Place the current player's mark and let the engine session follow the game"""
+        self.board.make_move(row, col, self.current_player)
+        self.session.advance(row * self.board.size + col)
         
     def display_welcome(self):
         """Display welcome message and game modes"""
@@ -79,7 +122,7 @@ class Game:
             row, col = self.get_human_move()
             
             # Make the move
-            self.board.make_move(row, col, self.current_player)
+            self.play_move(row, col)
             
             # Check for game end and switch player
             self.switch_player()
@@ -95,18 +138,22 @@ class Game:
         print("AI Algorithm Options:")
         print("1. Minimax")
         print("2. Alpha-Beta Pruning")
+        print("3. Auto (picks the engine for each move from a measured cost model)")
         
         while True:
             try:
-                choice = int(input("Select AI algorithm (1 or 2): "))
+                choice = int(input("Select AI algorithm (1-3): "))
                 if choice == 1:
                     ai_algorithm = 'minimax'
                     break
                 elif choice == 2:
                     ai_algorithm = 'alpha_beta'
                     break
+                elif choice == 3:
+                    ai_algorithm = 'auto'
+                    break
                 else:
-                    print("Please select 1 or 2")
+                    print("Please select 1-3")
             except ValueError:
                 print("Invalid input!")
                 
@@ -127,7 +174,7 @@ class Game:
                 
         # Set up AI player
         ai_symbol = 'O' if human_first else 'X'
-        self.ai_players['ai'] = AIPlayer(algorithm=ai_algorithm, player_symbol=ai_symbol)
+        self.ai_players['ai'] = self.new_ai_player(ai_algorithm, ai_symbol)
         
         print(f"\nYou are Player {'X' if not human_first else 'O'}")
         print(f"AI uses {ai_algorithm} algorithm")
@@ -141,21 +188,32 @@ class Game:
             if self.current_player == ('X' if human_first else 'O'):
                 # Human's turn
                 row, col = self.get_human_move()
-                self.board.make_move(row, col, self.current_player)
+                self.play_move(row, col)
             else:
                 # AI's turn
                 print("\nAI is thinking...")
                 ai_move = self.ai_players['ai'].get_move(self.board)
                 if ai_move:
                     row, col = ai_move
-                    self.board.make_move(row, col, self.current_player)
+                    self.play_move(row, col)
                     
                     # Display performance metrics
                     perf_metrics = self.ai_players['ai'].get_performance()
                     print(f"AI Decision Time: {perf_metrics['decision_time']} ms")
                     print(f"Nodes explored: {perf_metrics['nodes_explored']}")
+                    if perf_metrics['forced_move']:
+                        print(f"Forced move: {perf_metrics['forced_move']}")
+                    if perf_metrics['book_move']:
+                        print("Book move")
+                    if perf_metrics['engine']:
+                        print(f"Engine: {perf_metrics['engine']} ({perf_metrics['engine_reason']})")
+                    if perf_metrics['peak_kb'] is not None:
+                        print(f"Memory: peak {perf_metrics['peak_kb']} KB, "
+                              f"{perf_metrics['bytes_per_node']} bytes/node, "
+                              f"{perf_metrics['alloc_blocks']} blocks retained")
                     if ai_algorithm == 'alpha_beta':
                         print(f"Pruning efficiency: {perf_metrics['pruning_efficiency']}%")
+                        print(f"Reused from earlier moves: {perf_metrics['reused']} cache hits")
                 
             # Switch player
             self.switch_player()
@@ -170,38 +228,45 @@ class Game:
         print("AI 1 Algorithm Options:")
         print("1. Minimax")
         print("2. Alpha-Beta Pruning")
+        print("3. Auto (picks the engine for each move from a measured cost model)")
         
         while True:
             try:
-                choice = int(input("Select AI 1 algorithm (1 or 2): "))
+                choice = int(input("Select AI 1 algorithm (1-3): "))
                 if choice == 1:
                     ai1_algorithm = 'minimax'
                     break
                 elif choice == 2:
                     ai1_algorithm = 'alpha_beta'
                     break
+                elif choice == 3:
+                    ai1_algorithm = 'auto'
+                    break
                 else:
-                    print("Please select 1 or 2")
+                    print("Please select 1-3")
             except ValueError:
                 print("Invalid input!")
                 
         while True:
             try:
-                choice = int(input("Select AI 2 algorithm (1 or 2): "))
+                choice = int(input("Select AI 2 algorithm (1-3): "))
                 if choice == 1:
                     ai2_algorithm = 'minimax'
                     break
                 elif choice == 2:
                     ai2_algorithm = 'alpha_beta'
                     break
+                elif choice == 3:
+                    ai2_algorithm = 'auto'
+                    break
                 else:
-                    print("Please select 1 or 2")
+                    print("Please select 1-3")
             except ValueError:
                 print("Invalid input!")
                 
         # Set up AI players 
-        self.ai_players['ai1'] = AIPlayer(algorithm=ai1_algorithm, player_symbol='X')
-        self.ai_players['ai2'] = AIPlayer(algorithm=ai2_algorithm, player_symbol='O')
+        self.ai_players['ai1'] = self.new_ai_player(ai1_algorithm, 'X')
+        self.ai_players['ai2'] = self.new_ai_player(ai2_algorithm, 'O')
         
         print(f"\nAI 1 (X) uses {ai1_algorithm}")
         print(f"AI 2 (O) uses {ai2_algorithm}")
@@ -223,14 +288,25 @@ class Game:
             ai_move = ai_player.get_move(self.board)
             if ai_move:
                 row, col = ai_move
-                self.board.make_move(row, col, self.current_player)
+                self.play_move(row, col)
                 
                 # Display performance metrics for this AI
                 perf_metrics = ai_player.get_performance()
                 print(f"Decision Time: {perf_metrics['decision_time']} ms")
                 print(f"Nodes explored: {perf_metrics['nodes_explored']}")
+                if perf_metrics['forced_move']:
+                    print(f"Forced move: {perf_metrics['forced_move']}")
+                if perf_metrics['book_move']:
+                    print("Book move")
+                if perf_metrics['engine']:
+                    print(f"Engine: {perf_metrics['engine']} ({perf_metrics['engine_reason']})")
+                if perf_metrics['peak_kb'] is not None:
+                    print(f"Memory: peak {perf_metrics['peak_kb']} KB, "
+                          f"{perf_metrics['bytes_per_node']} bytes/node, "
+                          f"{perf_metrics['alloc_blocks']} blocks retained")
                 if ai_player.algorithm == 'alpha_beta':
                     print(f"Pruning efficiency: {perf_metrics['pruning_efficiency']}%")
+                    print(f"Reused from earlier moves: {perf_metrics['reused']} cache hits")
                     
             # Pause for better visualization
             input("\nPress Enter to continue...")
@@ -252,16 +328,19 @@ class Game:
                 
                 if choice == 1:
                     self.set_game_mode('human_vs_human')
+                    self.choose_board()
                     self.start_new_game()
                     self.play_human_vs_human()
                     
                 elif choice == 2:
                     self.set_game_mode('human_vs_ai')
+                    self.choose_board()
                     self.start_new_game()
                     self.play_human_vs_ai()
                     
                 elif choice == 3:
                     self.set_game_mode('ai_vs_ai')
+                    self.choose_board()
                     self.start_new_game()
                     self.play_ai_vs_ai()
                     
@@ -285,5 +364,15 @@ class Game:
                     print("Please enter 'y' or 'n'")
 
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Tic Tac Toe with Minimax and Alpha-Beta AI")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on this local port")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="measure the memory used by each AI search (tracemalloc, slower)")
+    args = parser.parse_args()
+    if args.metrics_port is not None:
+        metrics.start_http_server(args.metrics_port)
+        print(f"Metrics available at http://127.0.0.1:{args.metrics_port}/metrics")
+    
+    game = Game(profile_memory=args.profile_memory)
     game.run()
@@ -0,0 +1,142 @@
+# Monte Carlo tree search: an anytime engine for boards too large to search deeply
+
+"""
+UCT (upper confidence bounds applied to trees) with random playouts. Each iteration
+walks down the tree choosing the child with the best UCB1 value, adds one new child,
+plays random moves from it to the end of the game and backs the result up the path
+(1 for a win of the player who made the node's move, 0.5 for a draw).
+
+The search runs until `time_limit_ms` has passed (or `max_playouts` is reached) and
+plays the most visited root move, so it always answers in time; the move quality
+grows with the playouts it gets. Playouts only check the lines through the last move.
+
+Used by ttt_backend.get_ai_move(board, player, "MCTS") and by the Auto engine.
+"""
+
+import math
+import random
+import time
+
+import ttt_backend as backend
+from utils import SearchCancelled
+
+EXPLORATION = math.sqrt(2)
+
+_LINES_BY_CELL = {}
+
+
+def lines_by_cell(size, win_length):
+    """For every cell, the winning lines through it"""
+    key = (size, win_length)
+    if key not in _LINES_BY_CELL:
+        lines = backend.win_lines(size, win_length)
+        _LINES_BY_CELL[key] = tuple(tuple(line for line in lines if cell in line)
+                                    for cell in range(size * size))
+    return _LINES_BY_CELL[key]
+
+
+class _Node:
+    __slots__ = ("parent", "move", "mover", "children", "untried", "visits", "wins")
+
+    def __init__(self, parent, move, mover, untried):
+        self.parent = parent
+        self.move = move
+        self.mover = mover  # player who made `move`
+        self.children = []
+        self.untried = untried  # moves not expanded yet (empty once the game is over)
+        self.visits = 0
+        self.wins = 0.0
+
+    def select(self):
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits
+                   + EXPLORATION * math.sqrt(log_visits / child.visits))
+
+
+def _completes_line(board, cell, lines):
+    mark = board[cell]
+    return any(all(board[i] == mark for i in line) for line in lines[cell])
+
+
+def search(board, player, win_length=None, time_limit_ms=500, max_playouts=None, cancel=None, seed=None):
+    """
+    Choose a move for player on a 1D board within time_limit_ms.
+    Returns (move, metrics) with metrics playouts, nodes (tree size) and win_rate
+    (the chosen move's average playout result for player).
+    """
+    size = backend.board_size(board)
+    if win_length is None:
+        win_length = backend.default_win_length(size)
+    lines = lines_by_cell(size, win_length)
+    rng = random.Random(seed)
+    opponent = "O" if player == "X" else "X"
+    deadline = time.perf_counter() + time_limit_ms / 1000.0
+
+    root = _Node(None, None, opponent, backend.available_moves(board))
+    nodes = 1
+    playouts = 0
+    while max_playouts is None or playouts < max_playouts:
+        cells = list(board)
+        node = root
+        to_move = player
+        over = False
+
+        # Selection
+        while not node.untried and node.children:
+            node = node.select()
+            cells[node.move] = to_move
+            to_move = "O" if to_move == "X" else "X"
+        winner = None
+        if node is not root and _completes_line(cells, node.move, lines):
+            winner = node.mover
+            over = True
+
+        # Expansion
+        if not over and node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            cells[move] = to_move
+            if _completes_line(cells, move, lines):
+                child = _Node(node, move, to_move, [])
+                winner = to_move
+                over = True
+            else:
+                child = _Node(node, move, to_move, [i for i, mark in enumerate(cells) if mark == " "])
+            node.children.append(child)
+            nodes += 1
+            node = child
+            to_move = "O" if to_move == "X" else "X"
+
+        # Playout
+        if not over:
+            empty = [i for i, mark in enumerate(cells) if mark == " "]
+            rng.shuffle(empty)
+            for move in empty:
+                cells[move] = to_move
+                if _completes_line(cells, move, lines):
+                    winner = to_move
+                    break
+                to_move = "O" if to_move == "X" else "X"
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.mover:
+                node.wins += 1.0
+            node = node.parent
+        playouts += 1
+
+        if not playouts & 7:
+            if cancel is not None and cancel.cancelled:
+                raise SearchCancelled()
+            if time.perf_counter() >= deadline:
+                break
+
+    best = max(root.children, key=lambda child: child.visits) if root.children else None
+    metrics = {
+        "playouts": playouts,
+        "nodes": nodes,
+        "win_rate": round(best.wins / best.visits, 3) if best is not None else None,
+    }
+    return (best.move if best is not None else None), metrics
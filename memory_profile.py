@@ -0,0 +1,167 @@
+# Opt-in memory profiling of AI searches with tracemalloc
+
+"""
+MemoryProfile wraps one search and reports, relative to the memory in use before it:
+  peak_kb         - peak traced memory during the search
+  alloc_blocks    - memory blocks the search allocated that were still alive when it
+                    finished (cache entries, evaluators, ...). tracemalloc only sees live
+                    blocks, so short-lived per-node objects show up in the peak and in
+                    memory_report() instead.
+  bytes_per_node  - peak bytes divided by the nodes explored
+Enabled with get_ai_move(..., profile_memory=True) or AIPlayer(..., profile_memory=True).
+Tracing slows the search down several times, so it is off by default.
+tracemalloc is process-wide, so profiled searches in different threads run one at a time:
+otherwise one would stop tracing or reset the peak under the other. Searches that are not
+profiled still run alongside and count towards the peak.
+
+memory_report() ranks the allocation sites that hold memory inside the search: it
+snapshots the traced heap every few thousand nodes (through the search's cancellation
+check, so the search code is unchanged) and averages the per-line statistics.
+
+    python memory_profile.py --algo Alpha-Beta --size 4
+"""
+
+import argparse
+import linecache
+import os
+import threading
+import tracemalloc
+
+import ttt_backend as backend
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Held while a profile or memory_report owns tracemalloc; not reentrant, profiles do not nest
+_TRACING_LOCK = threading.Lock()
+
+
+class MemoryProfile:
+    """Context manager measuring the memory used by the code it wraps"""
+
+    def __init__(self):
+        self.peak = 0
+        self.blocks = 0
+
+    def __enter__(self):
+        _TRACING_LOCK.acquire()
+        try:
+            self._started = not tracemalloc.is_tracing()
+            if self._started:
+                tracemalloc.start()
+            self._before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+        except BaseException:
+            if tracemalloc.is_tracing() and self._started:
+                tracemalloc.stop()
+            _TRACING_LOCK.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.peak = max(0, tracemalloc.get_traced_memory()[1] - self._baseline)
+            after = tracemalloc.take_snapshot()
+            self.blocks = max(0, sum(stat.count_diff for stat in after.compare_to(self._before, "filename")))
+        finally:
+            self._before = None
+            if self._started:
+                tracemalloc.stop()
+            _TRACING_LOCK.release()
+        return False
+
+    def metrics(self, nodes):
+        return {
+            "peak_kb": round(self.peak / 1024, 2),
+            "alloc_blocks": self.blocks,
+            "bytes_per_node": round(self.peak / nodes, 2) if nodes else None,
+        }
+
+
+class _SnapshotSampler:
+    """Stand-in CancelToken that snapshots the traced heap instead of cancelling.
+    The engines read `cancelled` every 256 nodes (every node in AIPlayer)."""
+
+    def __init__(self, every):
+        self.every = every
+        self.checks = 0
+        self.samples = 0
+        self.sites = {}  # (filename, lineno) -> [total bytes, total blocks]
+
+    @property
+    def cancelled(self):
+        self.checks += 1
+        if self.checks % self.every == 0:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(True, os.path.join(_PACKAGE_DIR, "*")),
+                 tracemalloc.Filter(False, os.path.abspath(__file__))])
+            for stat in snapshot.statistics("lineno"):
+                frame = stat.traceback[0]
+                totals = self.sites.setdefault((frame.filename, frame.lineno), [0, 0])
+                totals[0] += stat.size
+                totals[1] += stat.count
+            self.samples += 1
+        return False
+
+
+def memory_report(board=None, player="X", algo="Alpha-Beta", size=3, win_length=None,
+                  max_depth=None, top=10, every=16):
+    """
+    Search board (an empty size x size board by default) with get_ai_move while sampling
+    the heap, and return the top allocation sites in the search as rows of
+    (site, average KB held, average blocks held, source line).
+    `every` is the number of cancellation checks between snapshots (one check per 256 nodes).
+    """
+    if board is None:
+        board = backend.new_board(size)
+    size = backend.board_size(board)
+    evaluator = None
+    if max_depth is not None:
+        from evaluation import LineEvaluator
+        evaluator = LineEvaluator(size, win_length)
+    sampler = _SnapshotSampler(every)
+    with _TRACING_LOCK:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            backend.get_ai_move(board, player, algo, cancel=sampler, win_length=win_length,
+                                max_depth=max_depth, evaluator=evaluator, forced_moves=False)
+        finally:
+            if started:
+                tracemalloc.stop()
+    if not sampler.samples:
+        return []
+    ranked = sorted(sampler.sites.items(), key=lambda item: -item[1][0])[:top]
+    rows = []
+    for (filename, lineno), (size_total, count_total) in ranked:
+        site = f"{os.path.relpath(filename, _PACKAGE_DIR)}:{lineno}"
+        rows.append((site, round(size_total / sampler.samples / 1024, 2),
+                     round(count_total / sampler.samples, 1), linecache.getline(filename, lineno).strip()))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the allocation sites of an AI search")
+    parser.add_argument("--algo", default="Alpha-Beta", choices=["Minimax", "Alpha-Beta"])
+    parser.add_argument("--size", type=int, default=3, choices=[size for size, _ in backend.GEOMETRIES])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    win_length = backend.default_win_length(args.size)
+    max_depth = backend.default_search_depth(args.size)
+    board = backend.new_board(args.size)
+    evaluator = None
+    if max_depth is not None:
+        from evaluation import LineEvaluator
+        evaluator = LineEvaluator(args.size, win_length)
+    move, metrics = backend.get_ai_move(board, "X", args.algo, win_length=win_length, max_depth=max_depth,
+                                        evaluator=evaluator, forced_moves=False, profile_memory=True)
+    print(f"{args.algo} on an empty {args.size}x{args.size} board: {metrics['nodes']:,} nodes, "
+          f"peak {metrics['peak_kb']} KB, {metrics['bytes_per_node']} bytes/node, "
+          f"{metrics['alloc_blocks']} blocks retained")
+    print("\nTop allocation sites held during the search:")
+    print(f"{'KB':>8} {'blocks':>8}  site")
+    for site, kb, blocks, source in memory_report(board, "X", args.algo, win_length=win_length,
+                                                  max_depth=max_depth, top=args.top):
+        print(f"{kb:>8} {blocks:>8}  {site}  {source}")
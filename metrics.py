@@ -0,0 +1,244 @@
+# Metrics registry for the AI engines with a Prometheus text exposition endpoint
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bucket upper bounds (the +Inf bucket is implicit)
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _format_labels(labelnames, values, extra=None):
+    """Render a label set as {a="x",b="y"} (empty string if there are no labels)"""
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter, one value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labelvalues):
+        """Add amount to the series for the given label values (in labelnames order)"""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return ["%s%s %s" % (self.name, _format_labels(self.labelnames, labels), _format_value(value))
+                for labels, value in items]
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, one series per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        """Record one observation for the given label values (in labelnames order)"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def get_count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                lines.append("%s_bucket%s %d" % (
+                    self.name, _format_labels(self.labelnames, labels, ("le", _format_value(float(bound)))),
+                    cumulative))
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append("%s_sum%s %s" % (self.name, label_text, _format_value(series[-1])))
+            lines.append("%s_count%s %d" % (self.name, label_text, cumulative))
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.documentation))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+SEARCHES = REGISTRY.counter(
+    "ttt_searches_total", "Number of AI move searches", ("algorithm",))
+DECISION_TIME = REGISTRY.histogram(
+    "ttt_decision_seconds", "Wall-clock time of an AI move search", ("algorithm",), TIME_BUCKETS)
+NODES = REGISTRY.histogram(
+    "ttt_search_nodes", "Game tree nodes explored per search", ("algorithm",), COUNT_BUCKETS)
+NODES_TOTAL = REGISTRY.counter(
+    "ttt_nodes_explored_total", "Game tree nodes explored", ("algorithm",))
+PRUNED_TOTAL = REGISTRY.counter(
+    "ttt_pruned_nodes_total", "Alpha-Beta cutoffs", ("algorithm",))
+CACHE_HITS_TOTAL = REGISTRY.counter(
+    "ttt_cache_hits_total", "Position cache hits during search", ("algorithm",))
+CACHE_REUSED_TOTAL = REGISTRY.counter(
+    "ttt_cache_reused_total", "Cache hits on entries stored by an earlier move's search", ("algorithm",))
+FORCED_MOVES_TOTAL = REGISTRY.counter(
+    "ttt_forced_moves_total", "Moves played by the pre-search tactical pass", ("algorithm", "tactic"))
+BOOK_HITS_TOTAL = REGISTRY.counter(
+    "ttt_book_hits_total", "Moves played from the opening book", ("algorithm",))
+AUTO_ENGINE_TOTAL = REGISTRY.counter(
+    "ttt_auto_engine_total", "Engines chosen by the Auto algorithm", ("engine",))
+
+
+# AIPlayer algorithm names -> the get_ai_move names used as the `algorithm` label, so both
+# front ends report each algorithm in one series
+ALGORITHM_LABELS = {"minimax": "Minimax", "alpha_beta": "Alpha-Beta", "auto": "Auto"}
+
+
+def algorithm_label(algorithm):
+    return ALGORITHM_LABELS.get(algorithm, algorithm)
+
+
+def record_search(algorithm, decision_time_ms, nodes, pruned=0, cache_hits=0, reused=0):
+    """Record one finished search (called by the engines, kept to a few microseconds)"""
+    algorithm = algorithm_label(algorithm)
+    SEARCHES.inc(1, algorithm)
+    DECISION_TIME.observe(decision_time_ms / 1000.0, algorithm)
+    NODES.observe(nodes, algorithm)
+    NODES_TOTAL.inc(nodes, algorithm)
+    if pruned:
+        PRUNED_TOTAL.inc(pruned, algorithm)
+    if cache_hits:
+        CACHE_HITS_TOTAL.inc(cache_hits, algorithm)
+    if reused:
+        CACHE_REUSED_TOTAL.inc(reused, algorithm)
+
+
+def record_forced_move(algorithm, tactic):
+    """Record a move chosen by the forced-move fast path instead of a search"""
+    FORCED_MOVES_TOTAL.inc(1, algorithm_label(algorithm), tactic)
+
+
+def record_book_hit(algorithm):
+    """Record a move played from the opening book instead of a search"""
+    BOOK_HITS_TOTAL.inc(1, algorithm_label(algorithm))
+
+
+def record_auto_choice(engine):
+    """Record the engine the Auto algorithm chose for a move"""
+    AUTO_ENGINE_TOTAL.inc(1, engine)
+
+
+# - HTTP exposition endpoint
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def start_http_server(port=8000, addr="127.0.0.1"):
+    """Serve /metrics from a daemon thread. Calling it again for the same port reuses the server."""
+    with _servers_lock:
+        server = _servers.get((addr, port))
+        if server is None:
+            server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            server.daemon_threads = True
+            thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+            thread.start()
+            _servers[(addr, port)] = server
+        return server
+
+
+def stop_http_server(port=8000, addr="127.0.0.1"):
+    """Stop a server started by start_http_server"""
+    with _servers_lock:
+        server = _servers.pop((addr, port), None)
+    if server is not None:
+        server.shutdown()
+        server.server_close()
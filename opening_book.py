@@ -0,0 +1,239 @@
+# Opening book: moves for the first plies, analysed offline and looked up instead of searched
+
+"""
+The builder enumerates every position with fewer than `plies` marks, reduced by the 8
+board symmetries, and searches each one deeper than the front ends do (Alpha-Beta with
+the line evaluator at `depth` plies). The result is a sorted file of fixed-size records:
+
+  header  b"TTTBOOK2" size:u8 win_length:u8 plies:u8 depth:u8 count:u32
+  record  key:u64 move:u8     (key = ttt_backend.position_key of the canonical board)
+
+The canonical form of a position is the symmetric variant with the smallest key, and the
+stored move is in canonical coordinates. OpeningBook memory-maps the file and finds a
+position with a binary search, so lookups cost 8 key computations and ~log2(count) reads.
+
+    python opening_book.py build --size 5 --plies 3
+    python opening_book.py match --size 5 --games 8
+
+get_ai_move(..., book=...) and AIPlayer(..., book=...) play the book move when there is
+one; load_book() opens the default book of a geometry if it has been built.
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+
+import ttt_backend as backend
+from evaluation import LineEvaluator
+
+# Version 2: position keys include the geometry (books of version 1 must be rebuilt)
+MAGIC = b"TTTBOOK2"
+_HEADER = struct.Struct("<8sBBBBI")
+_RECORD = struct.Struct("<QB")
+
+BOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books")
+
+
+def default_book_path(size, win_length=None):
+    if win_length is None:
+        win_length = backend.default_win_length(size)
+    return os.path.join(BOOK_DIR, f"book_{size}x{size}_k{win_length}.bin")
+
+
+def canonical(board, to_move, win_length=None):
+    """Return (key, perm) of the symmetric variant of board with the smallest position key.
+    Cell i of that variant is cell perm[i] of board."""
+    best = None
+    for perm in backend.board_symmetries(backend.board_size(board)):
+        key = backend.position_key([board[cell] for cell in perm], to_move, win_length)
+        if best is None or key < best[0]:
+            best = (key, perm)
+    return best
+
+
+# - Builder
+def build_book(size, win_length=None, plies=3, depth=None, path=None, progress=None):
+    """
+    Analyse every position with fewer than `plies` marks and write the book.
+    `depth` defaults to two plies more than the front ends search. Returns the record count.
+    """
+    if win_length is None:
+        win_length = backend.default_win_length(size)
+    if depth is None:
+        depth = (backend.default_search_depth(size) or size * size) + 2
+    if path is None:
+        path = default_book_path(size, win_length)
+    evaluator = LineEvaluator(size, win_length)
+    cache = backend.TranspositionTable()
+
+    records = {}
+    layer = {canonical(backend.new_board(size), "X", win_length)[0]: backend.new_board(size)}
+    for ply in range(plies):
+        player = "X" if ply % 2 == 0 else "O"
+        opponent = "O" if player == "X" else "X"
+        next_layer = {}
+        for key, board in sorted(layer.items()):
+            if backend.check_result(board, win_length)["status"] != "ongoing":
+                continue
+            move, _ = backend.get_ai_move(board, player, "Alpha-Beta", cache=cache, win_length=win_length,
+                                          max_depth=depth, evaluator=evaluator)
+            records[key] = move
+            if progress is not None:
+                progress(len(records))
+            for cell in backend.available_moves(board):
+                child = backend.place(board, cell, player)
+                child_key, perm = canonical(child, opponent, win_length)
+                if child_key not in next_layer:
+                    next_layer[child_key] = [child[i] for i in perm]
+        layer = next_layer
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, size, win_length, plies, depth, len(records)))
+        for key in sorted(records):
+            handle.write(_RECORD.pack(key, records[key]))
+    return len(records)
+
+
+# - Reader
+class OpeningBook:
+    """Read-only, memory-mapped opening book"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"{path} is not an opening book")
+        magic, self.size, self.win_length, self.plies, self.depth, self.count = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or len(self._map) != _HEADER.size + self.count * _RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not an opening book of this version (rebuild it)")
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            found, move = _RECORD.unpack_from(self._map, _HEADER.size + middle * _RECORD.size)
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return move
+        return None
+
+    def lookup(self, board, player, win_length=None):
+        """Book move (1D index) for player to move on board, or None"""
+        if len(board) != self.size * self.size or (win_length or self.win_length) != self.win_length:
+            return None
+        if len(board) - board.count(" ") >= self.plies:
+            return None
+        self.lookups += 1
+        key, perm = canonical(board, player, self.win_length)
+        move = self._find(key)
+        if move is None or board[perm[move]] != " ":
+            return None
+        self.hits += 1
+        return perm[move]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def load_book(size, win_length=None):
+    """Open the default book of a geometry, or return None if it has not been built"""
+    path = default_book_path(size, win_length)
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+# - Tournament runner
+def match(size, games=8, book=None, seed=0, random_plies=1):
+    """
+    Play Alpha-Beta against itself with and without the book. Each game starts with
+    `random_plies` random moves (the same ones in both runs).
+    Returns {"with_book": (search ms per game, hit rate), "without_book": (ms per game, None),
+    "saved_ms_per_game": ...}.
+    """
+    win_length = backend.default_win_length(size)
+    max_depth = backend.default_search_depth(size)
+    if book is None:
+        book = load_book(size, win_length)
+        if book is None:
+            raise FileNotFoundError(f"no book at {default_book_path(size, win_length)}; build it first")
+    rng = random.Random(seed)
+    openings = [rng.sample(range(size * size), random_plies) for _ in range(games)]
+
+    results = {}
+    for label, use_book in (("without_book", None), ("with_book", book)):
+        total_ms = 0.0
+        searches = hits = 0
+        for opening in openings:
+            board = backend.new_board(size)
+            player = "X"
+            for move in opening:
+                board = backend.place(board, move, player)
+                player = "O" if player == "X" else "X"
+            while backend.check_result(board, win_length)["status"] == "ongoing":
+                evaluator = LineEvaluator(size, win_length) if max_depth is not None else None
+                start = time.perf_counter()
+                move, metrics = backend.get_ai_move(board, player, "Alpha-Beta", win_length=win_length,
+                                                    max_depth=max_depth, evaluator=evaluator, book=use_book)
+                total_ms += (time.perf_counter() - start) * 1000.0
+                searches += 1
+                hits += bool(metrics.get("book"))
+                board = backend.place(board, move, player)
+                player = "O" if player == "X" else "X"
+        results[label] = (total_ms / games, hits / searches if use_book else None)
+    results["saved_ms_per_game"] = results["without_book"][0] - results["with_book"][0]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and evaluate opening books")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="analyse the opening and write a book")
+    build.add_argument("--size", type=int, default=5, choices=[size for size, _ in backend.GEOMETRIES])
+    build.add_argument("--plies", type=int, default=3, help="positions with fewer marks are in the book")
+    build.add_argument("--depth", type=int, default=None, help="analysis depth (default: front-end depth + 2)")
+    build.add_argument("--out", default=None)
+    tournament = commands.add_parser("match", help="book hit rate and latency saved in AI vs AI games")
+    tournament.add_argument("--size", type=int, default=5, choices=[size for size, _ in backend.GEOMETRIES])
+    tournament.add_argument("--games", type=int, default=8)
+    tournament.add_argument("--book", default=None)
+    tournament.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_book(args.size, plies=args.plies, depth=args.depth, path=args.out,
+                           progress=lambda done: print(f"\r{done} positions analysed", end="", flush=True))
+        path = args.out or default_book_path(args.size)
+        print(f"\nWrote {count} positions to {path} ({os.path.getsize(path)} bytes) "
+              f"in {time.perf_counter() - start:.1f} s")
+        return
+    book = OpeningBook(args.book) if args.book else None
+    results = match(args.size, args.games, book, args.seed)
+    without_ms, _ = results["without_book"]
+    with_ms, hit_rate = results["with_book"]
+    print(f"{args.size}x{args.size}, {args.games} games of Alpha-Beta vs Alpha-Beta")
+    print(f"  without book: {without_ms:.1f} ms of search per game")
+    print(f"  with book:    {with_ms:.1f} ms of search per game, book hit rate {hit_rate:.0%}")
+    print(f"  latency saved: {results['saved_ms_per_game']:.1f} ms per game")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# Proof-number search: proves game-theoretic results (win / loss / draw)
+
+"""
+Best-first proof-number search (PNS) over an explicit tree. Every node has a proof
+number (how many more leaves must be proven to prove the goal "the attacker wins")
+and a disproof number; the search repeatedly expands the most-proving leaf.
+
+solve() runs two proofs from the position of the side to move:
+  1. "player wins"      - proven: win
+  2. "opponent wins"    - proven: loss, disproven (after 1 was disproven): draw
+The proof move is the child that proved (1), or for a draw the child that disproved (2).
+For a lost position it is the move that delays the loss longest, as in the Alpha-Beta and
+Minimax engines: Alpha-Beta to depth 1, 2, ... until every move loses within the depth.
+
+Moves that a symmetry of the position maps onto each other are expanded only once.
+A new node is solved at once when the threats on the board decide it: the side to move
+can complete a line, the other side has two winning cells, or every line is blocked
+for the attacker.
+
+Memory is bounded in two ways:
+  - as soon as a node is proven or disproven its subtree is released (only the result
+    and the deciding move are kept), and the result goes into the solved-position table,
+    so transpositions elsewhere in the tree start out solved
+  - the solved-position table holds at most `max_table` entries; the oldest quarter is
+    dropped when it is full. If the live tree grows past `max_nodes`, the proof stops
+    and the result is None (unknown).
+
+Time is bounded too: with a `time_limit_ms`, the proof also stops with an unknown result
+once the time is up.
+
+Used by ttt_backend.get_ai_move(board, player, "PN-Search").
+"""
+
+import itertools
+import time
+
+import tactics
+import ttt_backend as backend
+from utils import DeadlineToken, SearchCancelled
+
+INF = 10 ** 9
+
+
+class _Node:
+    __slots__ = ("parent", "move", "pn", "dn", "children", "best")
+
+    def __init__(self, parent, move, pn=1, dn=1):
+        self.parent = parent
+        self.move = move
+        self.pn = pn
+        self.dn = dn
+        self.children = None  # None until expanded, released again once solved
+        self.best = None  # move that decided a solved node
+
+
+class ProofNumberSearch:
+    """Proof-number solver for one board geometry (size taken from the board)"""
+
+    def __init__(self, win_length=None, max_nodes=2_000_000, max_table=1_000_000, cancel=None, deadline=None):
+        self.win_length = win_length
+        self.max_nodes = max_nodes
+        self.max_table = max_table
+        self.cancel = cancel  # utils.CancelToken, checked every 64 expansions
+        self.deadline = deadline  # time.perf_counter() value at which the proof gives up
+        self.timed_out = False
+        self.table = {}  # (position key * 2 + attacker is O) -> attacker wins
+        self.nodes = 0  # nodes created
+        self.live = 0  # nodes currently in the tree
+        self.peak = 0
+        self.freed = 0  # nodes released by solved-subtree collection
+        self.evicted = 0  # solved-table entries dropped to stay within max_table
+
+    # - Solved-position table
+    def _table_key(self, board, to_move, attacker):
+        return backend.position_key(board, to_move, self.win_length) * 2 + (attacker == "O")
+
+    def _remember(self, key, proven):
+        if len(self.table) >= self.max_table:
+            stale = list(itertools.islice(self.table, self.max_table // 4 or 1))
+            for old in stale:
+                del self.table[old]
+            self.evicted += len(stale)
+        self.table[key] = proven
+
+    # - Tree maintenance
+    def _release(self, node):
+        """Drop the subtree below a solved node"""
+        stack = list(node.children)
+        node.children = None
+        while stack:
+            child = stack.pop()
+            self.live -= 1
+            self.freed += 1
+            if child.children:
+                stack.extend(child.children)
+
+    def _evaluate_leaf(self, node, board, to_move, attacker):
+        """Set pn/dn of a new node from the game result or the solved table"""
+        result = backend.check_result(board, self.win_length)
+        if result["status"] == "win":
+            node.pn, node.dn = (0, INF) if result["winner"] == attacker else (INF, 0)
+        elif result["status"] == "draw":
+            node.pn, node.dn = INF, 0
+        else:
+            proven = self.table.get(self._table_key(board, to_move, attacker))
+            if proven is None:
+                proven = self._decided(board, to_move, attacker)
+            if proven is not None:
+                node.pn, node.dn = (0, INF) if proven else (INF, 0)
+
+    def _decided(self, board, to_move, attacker):
+        """Results that follow from the threats on the board (see tactics.py):
+        an immediate win, an unstoppable double threat, or no line left for the attacker"""
+        masks = tactics.line_masks(backend.board_size(board), self.win_length)
+        k = bin(masks[0]).count("1")
+        x_bits, o_bits = tactics.board_bits(board)
+        own, other = (x_bits, o_bits) if to_move == "X" else (o_bits, x_bits)
+        if tactics.threat_cells(own, other, masks, k):
+            return to_move == attacker
+        threats = tactics.threat_cells(other, own, masks, k)
+        if threats & (threats - 1):
+            return to_move != attacker
+        defender = other if to_move == attacker else own
+        if all(defender & mask for mask in masks):
+            return False
+        return None
+
+    def _expand(self, node, board, to_move, attacker):
+        node.children = []
+        nxt = "O" if to_move == "X" else "X"
+        # Symmetries that leave the position unchanged; moves they map onto each other
+        # lead to equivalent positions, so only the lowest cell of each orbit is kept
+        stabilizer = [perm for perm in backend.board_symmetries(backend.board_size(board))[1:]
+                      if all(board[perm[cell]] == mark for cell, mark in enumerate(board))]
+        for move in backend.available_moves(board):
+            if stabilizer and any(perm[move] < move for perm in stabilizer):
+                continue
+            child = _Node(node, move)
+            board[move] = to_move
+            self._evaluate_leaf(child, board, nxt, attacker)
+            board[move] = " "
+            node.children.append(child)
+        self.nodes += len(node.children)
+        self.live += len(node.children)
+        self.peak = max(self.peak, self.live)
+
+    def _update(self, node, is_or):
+        """Recompute pn/dn from the children; release the subtree if it is solved"""
+        children = node.children
+        if is_or:
+            node.pn = min(child.pn for child in children)
+            node.dn = min(INF, sum(child.dn for child in children))
+        else:
+            node.pn = min(INF, sum(child.pn for child in children))
+            node.dn = min(child.dn for child in children)
+        if node.pn == 0 or node.dn == 0:
+            deciding = next((child for child in children
+                             if (child.pn == 0 if node.pn == 0 else child.dn == 0)), None)
+            node.best = deciding.move if deciding is not None and (is_or == (node.pn == 0)) else None
+            self._release(node)
+
+    # - Search
+    def prove(self, board, to_move, attacker):
+        """
+        Prove or disprove "attacker wins" from board with to_move to play.
+        Returns (True/False/None, move): the move that decided the root (None if every
+        move had to be examined, or if the node budget ran out first).
+        """
+        board = list(board)
+        root = _Node(None, None)  # always expanded, so a solved root knows its deciding move
+        self.live += 1
+        expansions = 0
+        while root.pn and root.dn:
+            # Descend to the most-proving node
+            node, player, is_or = root, to_move, to_move == attacker
+            path = []
+            while node.children is not None:
+                node = min(node.children, key=(lambda c: c.pn) if is_or else (lambda c: c.dn))
+                board[node.move] = player
+                path.append(node.move)
+                player = "O" if player == "X" else "X"
+                is_or = not is_or
+            self._expand(node, board, player, attacker)
+            expansions += 1
+
+            # Back up the new numbers (stop once an ancestor does not change)
+            while node is not None:
+                old = (node.pn, node.dn)
+                self._update(node, is_or)
+                if node.pn == 0 or node.dn == 0:
+                    self._remember(self._table_key(board, player, attacker), node.pn == 0)
+                if (node.pn, node.dn) == old and node.children is not None:
+                    break
+                if path:
+                    board[path.pop()] = " "
+                    player = "O" if player == "X" else "X"
+                node = node.parent
+                is_or = not is_or
+            for move in path:
+                board[move] = " "
+
+            if self.live > self.max_nodes:
+                break
+            if not expansions & 63:
+                if self.cancel is not None and self.cancel.cancelled:
+                    raise SearchCancelled()
+                if self.deadline is not None and time.perf_counter() >= self.deadline:
+                    self.timed_out = True
+                    break
+
+        if root.children:
+            self._release(root)
+        self.live -= 1
+        if root.pn == 0:
+            return True, root.best
+        if root.dn == 0:
+            return False, root.best
+        return None, None
+
+    def solve(self, board, player):
+        """Return ("win"|"loss"|"draw"|None, move) for player to move on a 1D board"""
+        opponent = "O" if player == "X" else "X"
+        wins, move = self.prove(board, player, player)
+        if wins:
+            return "win", move
+        if wins is None:
+            return None, None
+        loses, move = self.prove(board, player, opponent)
+        if loses:
+            return "loss", self.longest_defence(board, player)
+        if loses is None:
+            return None, None
+        return "draw", move
+
+    def longest_defence(self, board, player):
+        """
+        Move that delays the loss longest in a lost position. A win at ply p scores
+        WIN_SCORE - p, so once every move loses within the depth limit, the Alpha-Beta move
+        is the one that loses latest. If time runs out first, the move of the deepest
+        finished iteration is returned (it survives at least that many plies).
+        """
+        opponent = "O" if player == "X" else "X"
+        cancel = self.cancel
+        if self.deadline is not None:
+            cancel = DeadlineToken(self.deadline - time.perf_counter(), self.cancel)
+        cache = backend.TranspositionTable()
+        move = None
+        for depth in range(1, board.count(" ") + 1):
+            ctx = backend.SearchContext(self.win_length, depth, cache=cache, cancel=cancel)
+            try:
+                score, best = backend.alphabeta(list(board), float('-inf'), float('inf'), True,
+                                                player, opponent, 0, ctx)
+            except SearchCancelled:
+                if self.cancel is not None and self.cancel.cancelled:
+                    raise
+                break
+            move = best
+            if score < -backend.MATE_BOUND:
+                break
+        return move if move is not None else backend.available_moves(board)[0]
+
+
+def solve(board, player, win_length=None, max_nodes=2_000_000, max_table=1_000_000, cancel=None,
+          time_limit_ms=None):
+    """
+    Prove the result of a 1D board for player to move, giving up after `time_limit_ms`
+    (None = no time limit).
+    Returns (result, move, metrics) with result "win", "loss", "draw" or None (budget exhausted).
+    """
+    start = time.perf_counter()
+    deadline = start + time_limit_ms / 1000.0 if time_limit_ms is not None else None
+    search = ProofNumberSearch(win_length, max_nodes, max_table, cancel, deadline)
+    result, move = search.solve(board, player)
+    metrics = {
+        "nodes": search.nodes,
+        "table_size": len(search.table),
+        "peak_nodes": search.peak,
+        "freed": search.freed,
+        "evicted": search.evicted,
+        "timed_out": search.timed_out,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 3),
+    }
+    return result, move, metrics
+
+
+def _verify_3x3():
+    """Check every reachable 3x3 position against the exact Alpha-Beta value:
+    the same result, and the proof move keeps it"""
+    checked = 0
+    seen = set()
+
+    def exact_score(board, player):
+        opponent = "O" if player == "X" else "X"
+        score, _ = backend.alphabeta(list(board), float('-inf'), float('inf'), True, player, opponent)
+        return score
+
+    def exact(board, player):
+        score = exact_score(board, player)
+        return (score > 0) - (score < 0)
+
+    def visit(board, player):
+        nonlocal checked
+        key = tuple(board)
+        if key in seen:
+            return
+        seen.add(key)
+        if backend.check_result(board)["status"] != "ongoing":
+            return
+        result, move, _ = solve(board, player)
+        expected = exact(board, player)
+        if result != ("win", "draw", "loss")[1 - expected]:
+            raise AssertionError(f"{result} on {board} ({player} to move), expected value {expected}")
+        after = backend.place(board, move, player)
+        opponent = "O" if player == "X" else "X"
+        status = backend.check_result(after)["status"]
+        if result != "loss":
+            value = (status == "win") if status != "ongoing" else -exact(after, opponent)
+            if value != expected:
+                raise AssertionError(f"proof move {move} on {board} ({player} to move) does not keep the {result}")
+        elif status == "ongoing":
+            # The move must lose as late as the best defence (scores from player's view, one ply on)
+            best = exact_score(board, player)
+            if -exact_score(after, opponent) != best - 1:
+                raise AssertionError(f"move {move} on lost {board} ({player} to move) does not delay the loss longest")
+        checked += 1
+        nxt = "O" if player == "X" else "X"
+        for cell in backend.available_moves(board):
+            board[cell] = player
+            visit(board, nxt)
+            board[cell] = " "
+
+    visit(backend.new_board(), "X")
+    return checked
+
+
+if __name__ == "__main__":
+    print(f"3x3: {_verify_3x3()} reachable positions solved, all matching Alpha-Beta")
+    # The empty 5x5 board (k=4) does not fit the default node budget
+    for size, win_length in [(3, 3), (4, 4)]:
+        result, move, metrics = solve(backend.new_board(size), "X", win_length)
+        print(f"{size}x{size} k={win_length} empty board: {result or 'unknown'} (move {move}), "
+              f"{metrics['nodes']:,} nodes, peak tree {metrics['peak_nodes']:,}, "
+              f"table {metrics['table_size']:,}, {metrics['elapsed_ms'] / 1000:.1f} s")
@@ -0,0 +1,88 @@
+# Per-game engine session: search state reused between moves
+
+"""
+Every position a search reaches a couple of plies below the root is the root
+of a later search in the same game. An EngineSession keeps what the previous
+searches learned and hands it to the next one:
+  - the transposition table (entries from earlier searches stay valid because
+    scores are stored relative to their own position)
+  - the principal variation (PV), the line of play the last search expected
+  - the history table, which scores cells that caused cutoffs, for move ordering
+Call advance() for every move played (by either side). It advances the PV and
+drops table entries for positions with fewer marks than the current board,
+because those can no longer occur.
+
+Used by ttt_backend.get_ai_move(..., session=...) and AIPlayer(session=...).
+"""
+
+import ttt_backend as backend
+
+
+class EngineSession:
+    def __init__(self, size=3, win_length=None, table=None):
+        self.size = size
+        self.win_length = win_length
+        self.table = table if table is not None else backend.TranspositionTable()
+        self.history = [0] * (size * size)
+        self.pv = []  # expected moves from the current position onwards
+        self.stones = 0  # marks on the board (moves played since the empty board)
+        self.searches = 0
+        self.pv_followed = 0  # played moves that matched the expected PV
+        self.entries_pruned = 0
+
+    def begin_search(self):
+        """Start a search: new table generation, aged history scores.
+        Returns the table's reuse counter, to be passed to end_search."""
+        self.searches += 1
+        if hasattr(self.table, "new_generation"):
+            self.table.new_generation()
+        for cell, score in enumerate(self.history):
+            self.history[cell] = score // 2
+        return getattr(self.table, "reused", 0)
+
+    def end_search(self, board, player, move, reused_before):
+        """Finish a search on a 1D board: record the new PV.
+        Returns the number of cache lookups answered by earlier searches."""
+        self.pv = self.principal_variation(board, player, move)
+        return getattr(self.table, "reused", 0) - reused_before
+
+    def _peek(self, key):
+        entries = getattr(self.table, "entries", None)
+        if entries is not None:
+            return entries.get(key)
+        return self.table.probe(key)
+
+    def principal_variation(self, board, player, first_move):
+        """Follow the cached best moves from board after player plays first_move"""
+        board = list(board)
+        pv = [first_move]
+        board[first_move] = player
+        to_move = "O" if player == "X" else "X"
+        while backend.check_result(board, self.win_length)["status"] == "ongoing":
+            entry = self._peek(backend.position_key(board, to_move, self.win_length))
+            if entry is None or entry[2] is None or board[entry[2]] != " ":
+                break
+            pv.append(entry[2])
+            board[entry[2]] = to_move
+            to_move = "O" if to_move == "X" else "X"
+        return pv
+
+    def advance(self, move):
+        """Record a move played on the game board (1D index), by either side"""
+        if self.pv and self.pv[0] == move:
+            self.pv.pop(0)
+            self.pv_followed += 1
+        else:
+            self.pv = []
+        self.stones += 1
+        if hasattr(self.table, "prune"):
+            self.entries_pruned += self.table.prune(self.stones)
+
+    def stats(self):
+        return {
+            "searches": self.searches,
+            "table_entries": len(self.table) if hasattr(self.table, "entries") else None,
+            "entries_pruned": self.entries_pruned,
+            "pv_followed": self.pv_followed,
+            "reused": getattr(self.table, "reused", None),
+        }
@@ -0,0 +1,151 @@
+# Cross-process transposition table in multiprocessing.shared_memory
+
+"""
+A fixed-size, lock-free position cache that several processes can attach to by
+name (Streamlit workers, a process pool, a tournament runner, ...). It has the
+same probe/store interface as ttt_backend.TranspositionTable, so it can be
+passed as the `cache` argument of ttt_backend.get_ai_move.
+
+Layout: a 16-byte header followed by 2-entry buckets. Each entry is two 64-bit
+words, (key XOR data, data). A reader only accepts an entry whose words XOR
+back to the probed key, so an entry torn by a concurrent writer in another
+process is dropped as a miss instead of returning mixed fields. No locks are
+needed.
+
+data word:  bit 63     valid flag
+            bits 0-15  score + 32768
+            bits 16-17 bound (EXACT / LOWER / UPPER)
+            bits 18-25 move (255 = none)
+            bits 26-33 depth (remaining empty cells)
+            bits 34-41 generation (search counter, for the replacement policy)
+"""
+
+import struct
+from multiprocessing import shared_memory
+
+_HEADER = struct.Struct("<8sII")  # magic, bucket count, generation
+_MAGIC = b"TTTSHTT1"
+_ENTRY = struct.Struct("<QQ")
+_BUCKET_SIZE = 2 * _ENTRY.size
+_VALID = 1 << 63
+_MASK64 = (1 << 64) - 1
+_NO_MOVE = 255
+
+
+def _pack(score, bound, move, depth, generation):
+    return (_VALID | (score + 32768) | (bound << 16) | ((_NO_MOVE if move is None else move) << 18)
+            | (depth << 26) | (generation << 34))
+
+
+def _unpack(data):
+    move = (data >> 18) & 0xFF
+    return ((data & 0xFFFF) - 32768, (data >> 16) & 0x3,
+            None if move == _NO_MOVE else move, (data >> 26) & 0xFF)
+
+
+def _mix(key):
+    """64-bit multiplicative hash so neighbouring positions spread over the buckets"""
+    key = (key * 0x9E3779B97F4A7C15) & _MASK64
+    return key ^ (key >> 29)
+
+
+class SharedTranspositionTable:
+    """
+    Position cache shared between processes.
+    Create it once with create=True, then attach elsewhere with the same name.
+    Replacement: an entry for the same key is only overwritten by one at least as deep;
+    otherwise slot 0 of a bucket keeps the deepest (or current-generation) entry and
+    slot 1 is always replaced.
+    """
+
+    def __init__(self, name=None, buckets=1 << 16, create=False):
+        if create:
+            size = _HEADER.size + buckets * _BUCKET_SIZE
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+            _HEADER.pack_into(self.shm.buf, 0, _MAGIC, buckets, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            magic, buckets, _ = _HEADER.unpack_from(self.shm.buf, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"shared memory block {name!r} is not a transposition table")
+        self.name = self.shm.name
+        self.buckets = buckets
+        self.generation = _HEADER.unpack_from(self.shm.buf, 0)[2] & 0xFF
+        # Per-process statistics
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @classmethod
+    def create(cls, name=None, buckets=1 << 16):
+        return cls(name=name, buckets=buckets, create=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    def _bucket_offset(self, key):
+        return _HEADER.size + (_mix(key) % self.buckets) * _BUCKET_SIZE
+
+    def probe(self, key):
+        """Return (score, bound, move, depth) for key, or None"""
+        self.probes += 1
+        offset = self._bucket_offset(key)
+        buf = self.shm.buf
+        for slot in (offset, offset + _ENTRY.size):
+            check, data = _ENTRY.unpack_from(buf, slot)
+            if not data & _VALID:
+                continue
+            if check ^ data == key:
+                self.hits += 1
+                return _unpack(data)
+        return None
+
+    def store(self, key, score, bound, move, depth, stones=0):
+        """Store an entry; `stones` is accepted for interface compatibility and not kept"""
+        self.stores += 1
+        data = _pack(score, bound, move, depth, self.generation)
+        offset = self._bucket_offset(key)
+        buf = self.shm.buf
+        check0, data0 = _ENTRY.unpack_from(buf, offset)
+        check1, data1 = _ENTRY.unpack_from(buf, offset + _ENTRY.size)
+        if data0 & _VALID and check0 ^ data0 == key:
+            slot, old = offset, data0
+        elif data1 & _VALID and check1 ^ data1 == key:
+            slot, old = offset + _ENTRY.size, data1
+        else:
+            old = None
+            if (not data0 & _VALID or depth >= (data0 >> 26) & 0xFF
+                    or (data0 >> 34) & 0xFF != self.generation):
+                slot = offset
+            else:
+                slot = offset + _ENTRY.size
+        if old is not None and depth < (old >> 26) & 0xFF:
+            return  # keep the deeper result for this position
+        _ENTRY.pack_into(buf, slot, key ^ data, data)
+
+    def new_generation(self):
+        """Start a new search generation: older entries become preferred for replacement"""
+        magic, buckets, generation = _HEADER.unpack_from(self.shm.buf, 0)
+        generation = (generation + 1) & 0xFF
+        _HEADER.pack_into(self.shm.buf, 0, magic, buckets, generation)
+        self.generation = generation
+
+    def clear(self):
+        size = self.buckets * _BUCKET_SIZE
+        self.shm.buf[_HEADER.size:_HEADER.size + size] = bytes(size)
+
+    def __len__(self):
+        """Number of occupied entries (scans the table)"""
+        count = 0
+        for offset in range(_HEADER.size, _HEADER.size + self.buckets * _BUCKET_SIZE, _ENTRY.size):
+            if _ENTRY.unpack_from(self.shm.buf, offset)[1] & _VALID:
+                count += 1
+        return count
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -1,7 +1,12 @@
 import streamlit as st
 import time
 from typing import Dict, Optional
+import metrics
 import ttt_backend as backend
+from evaluation import LineEvaluator
+from opening_book import load_book
+from session import EngineSession
+from tree_recorder import TreeRecorder
 
 st.set_page_config(page_title="Tic-Tac-Toe — Minimax vs Alpha-Beta", page_icon="🎮", layout="centered")
 
@@ -112,6 +117,8 @@ def init_state():
         st.session_state.algo_p2 = "Alpha-Beta"
     if "human_plays" not in st.session_state:
         st.session_state.human_plays = "X"
+    if "geometry" not in st.session_state:
+        st.session_state.geometry = "3x3"
     if "board" not in st.session_state:
         st.session_state.board = backend.new_board()
     if "current" not in st.session_state:
@@ -124,13 +131,38 @@ def init_state():
         st.session_state.autoplay = False
     if "speed" not in st.session_state:
         st.session_state.speed = 0.4  # seconds
+    if "metrics_port" not in st.session_state:
+        st.session_state.metrics_port = 9108
+    if "auto_target_ms" not in st.session_state:
+        st.session_state.auto_target_ms = backend.DEFAULT_TIME_LIMIT_MS
+    if "engine_session" not in st.session_state:
+        st.session_state.engine_session = EngineSession()  # search state reused between moves
+
+# Engines offered in the sidebar (PN-Search proves the result, see pns.py; Auto picks an
+# engine for every move from a measured cost model, see auto.py)
+ALGORITHMS = ["Minimax", "Alpha-Beta", "PN-Search", "Auto"]
+
+# Board options: label -> (size, win length)
+GEOMETRIES = {
+    f"{size}x{size}" + ("" if size == k else f" (k={k})"): (size, k) for size, k in backend.GEOMETRIES
+}
+
+def geometry():
+    return GEOMETRIES[st.session_state.geometry]
+
+@st.cache_resource
+def opening_book(size: int, win_length: int):
+    """Opening book of a geometry, if one has been built (see opening_book.py)"""
+    return load_book(size, win_length)
 
 def soft_reset():
-    st.session_state.board = backend.new_board()
+    st.session_state.board = backend.new_board(geometry()[0])
     st.session_state.current = "X"
     st.session_state.history = []
     st.session_state.game_over = False
     st.session_state.autoplay = False
+    st.session_state.engine_session = EngineSession(*geometry())
+    st.session_state.last_tree = None
 
 init_state()
 
@@ -142,9 +174,35 @@ with st.sidebar:
         ["Human vs Human", "Human vs AI", "AI vs AI"],
         index=["Human vs Human","Human vs AI","AI vs AI"].index(st.session_state.mode)
     )
-    st.session_state.algo_p1 = st.selectbox("Algorithm for X", ["Minimax", "Alpha-Beta"], index=0)
-    st.session_state.algo_p2 = st.selectbox("Algorithm for O", ["Minimax", "Alpha-Beta"], index=1)
+    geometry_choice = st.selectbox(
+        "Board",
+        list(GEOMETRIES),
+        index=list(GEOMETRIES).index(st.session_state.geometry)
+    )
+    if geometry_choice != st.session_state.geometry:
+        st.session_state.geometry = geometry_choice
+        soft_reset()
+    st.session_state.algo_p1 = st.selectbox("Algorithm for X", ALGORITHMS, index=0)
+    st.session_state.algo_p2 = st.selectbox("Algorithm for O", ALGORITHMS, index=1)
     st.session_state.human_plays = st.selectbox("Human plays as", ["X", "O"], index=0)
+    # Auto aims for this latency; PN-Search gives up its proof after it
+    if {"Auto", "PN-Search"} & {st.session_state.algo_p1, st.session_state.algo_p2}:
+        st.session_state.auto_target_ms = st.number_input(
+            "Time limit per AI move (ms)", min_value=10, max_value=10000,
+            value=int(st.session_state.auto_target_ms), step=50
+        )
+    with st.expander("📈 Metrics endpoint"):
+        st.session_state.metrics_port = st.number_input(
+            "Port", min_value=1024, max_value=65535, value=st.session_state.metrics_port, step=1
+        )
+        if st.checkbox("Serve Prometheus metrics", key="metrics_enabled"):
+            try:
+                metrics.start_http_server(int(st.session_state.metrics_port))
+                st.caption(f"Serving http://127.0.0.1:{st.session_state.metrics_port}/metrics")
+            except OSError as exc:
+                st.error(f"Could not start metrics server: {exc}")
+        st.checkbox("Profile AI memory (tracemalloc, slower)", key="profile_memory")
+        st.checkbox("Record the search tree of AI moves", key="record_tree")
     # (Removed) st.session_state.speed = st.slider("AI auto-play speed (sec/move)", 0.1, 2.0, st.session_state.speed, 0.1)
 
 
@@ -191,7 +249,20 @@ def apply_ai_if_needed():
         player = st.session_state.current
         algo = algo_for(player)
         start = time.perf_counter()
-        move, metrics = backend.get_ai_move(st.session_state.board, player, algo)
+        size, win_length = geometry()
+        # Auto chooses its own depth for every move
+        max_depth = backend.default_search_depth(size) if algo != "Auto" else None
+        evaluator = LineEvaluator(size, win_length) if max_depth is not None else None
+        recorder = TreeRecorder() if st.session_state.get("record_tree") else None
+        move, metrics = backend.get_ai_move(st.session_state.board, player, algo, win_length=win_length,
+                                            max_depth=max_depth, evaluator=evaluator,
+                                            session=st.session_state.engine_session,
+                                            profile_memory=st.session_state.get("profile_memory", False),
+                                            book=opening_book(size, win_length),
+                                            time_limit_ms=st.session_state.auto_target_ms,
+                                            recorder=recorder)
+        if recorder is not None and len(recorder):
+            st.session_state.last_tree = recorder
         elapsed = (time.perf_counter() - start) * 1000.0  # ms
         metrics = metrics or {}
         metrics.setdefault("decision_time_ms", round(elapsed, 3))
@@ -205,7 +276,8 @@ def make_move(idx: int, player: str, algo_used: Optional[str]=None, metrics: Opt
     if st.session_state.board[idx] != " " or st.session_state.game_over:
         return
     st.session_state.board = backend.place(st.session_state.board, idx, player)
-    result = backend.check_result(st.session_state.board)
+    st.session_state.engine_session.advance(idx)
+    result = backend.check_result(st.session_state.board, geometry()[1])
     st.session_state.history.append({
         "move_index": idx,
         "player": player,
@@ -214,6 +286,15 @@ def make_move(idx: int, player: str, algo_used: Optional[str]=None, metrics: Opt
         "nodes": (metrics or {}).get("nodes"),
         "pruned": (metrics or {}).get("pruned"),
         "prune_pct": (metrics or {}).get("prune_pct"),
+        "tactic": (metrics or {}).get("tactic"),
+        "book": (metrics or {}).get("book"),
+        "reused": (metrics or {}).get("reused"),
+        "result": (metrics or {}).get("result"),
+        "engine": (metrics or {}).get("engine"),
+        "reason": (metrics or {}).get("reason"),
+        "peak_kb": (metrics or {}).get("peak_kb"),
+        "alloc_blocks": (metrics or {}).get("alloc_blocks"),
+        "bytes_per_node": (metrics or {}).get("bytes_per_node"),
     })
     if result["status"] != "ongoing":
         st.session_state.game_over = True
@@ -238,17 +319,15 @@ def render_cell(i: int, winning_cells=None):
         st.rerun()
 
 # determine winning cells
-_result_for_highlight = backend.check_result(st.session_state.board)
+_result_for_highlight = backend.check_result(st.session_state.board, geometry()[1])
 _winning_cells = set(_result_for_highlight["line"]) if _result_for_highlight["status"] == "win" else None
 
-board_cols = st.columns(3, gap="small")
-for r in range(3):
-    with board_cols[0]:
-        render_cell(3*r + 0, _winning_cells)
-    with board_cols[1]:
-        render_cell(3*r + 1, _winning_cells)
-    with board_cols[2]:
-        render_cell(3*r + 2, _winning_cells)
+_size = geometry()[0]
+board_cols = st.columns(_size, gap="small")
+for r in range(_size):
+    for c in range(_size):
+        with board_cols[c]:
+            render_cell(_size*r + c, _winning_cells)
 
 # Restart button
 center = st.columns([1, 1, 1])
@@ -261,7 +340,7 @@ with center[1]:
         st.markdown('</div>', unsafe_allow_html=True)
 
 # Draw status
-result = backend.check_result(st.session_state.board)
+result = backend.check_result(st.session_state.board, geometry()[1])
 status = result["status"]
 if status == "win":
     st.success(f"✅ {result['winner']} wins!")
@@ -277,6 +356,26 @@ if st.session_state.history:
     st.subheader("📊 Performance per move")
     st.dataframe(df, use_container_width=True)
 
+# Search tree of the last recorded AI move (see tree_recorder.py)
+if st.session_state.get("record_tree") and st.session_state.get("last_tree") is not None:
+    import pandas as pd
+    tree = st.session_state.last_tree
+    summary = tree.summary()
+    st.subheader("🌳 Search tree of the last AI move")
+    st.caption(f"{summary['algorithm']}: {summary['nodes']:,} nodes to depth {summary['max_depth']}, "
+               f"{summary['cutoffs']:,} cutoffs, {summary['bytes'] / 1024:.0f} KB recorded"
+               + (" (truncated)" if summary["truncated"] else ""))
+    depths = pd.DataFrame(tree.depth_table(),
+                          columns=["depth", "nodes", "cutoffs", "cached", "children"]).set_index("depth")
+    t1, t2 = st.columns(2)
+    with t1:
+        st.caption("Nodes per depth")
+        st.bar_chart(depths[["nodes"]])
+    with t2:
+        st.caption("Cutoffs and cache answers per depth")
+        st.bar_chart(depths[["cutoffs", "cached"]])
+    st.download_button("Download tree", tree.to_bytes(), file_name="search_tree.bin")
+
 # Autoplay (AI vs AI)
 if st.session_state.mode == "AI vs AI" and not st.session_state.game_over:
     c4, c5 = st.columns(2)
@@ -0,0 +1,101 @@
+# Cross-process checks of shared_tt.SharedTranspositionTable: hit-rate gain, replacement
+# policy and torn-read safety
+
+from multiprocessing import Pool
+
+import pytest
+
+import ttt_backend as backend
+from shared_tt import SharedTranspositionTable
+
+WORKERS = 4
+
+# Positions after the first move, and after each reply to a centre opening
+OPENINGS = [(i,) for i in range(9)] + [(4, i) for i in range(9) if i != 4]
+
+
+def _solve_positions(args):
+    """Worker: search the openings through the shared table, return (nodes, hits, probes)"""
+    name, openings = args
+    table = SharedTranspositionTable.attach(name)
+    nodes = 0
+    try:
+        for opening in openings:
+            board = backend.new_board()
+            player = "X"
+            for idx in opening:
+                board = backend.place(board, idx, player)
+                player = "O" if player == "X" else "X"
+            _, metrics = backend.get_ai_move(board, player, "Alpha-Beta", cache=table)
+            nodes += metrics["nodes"]
+        return nodes, table.hits, table.probes
+    finally:
+        table.close()
+
+
+def _hammer(args):
+    """Worker: keep rewriting a few keys with changing data, or read them and count entries
+    whose fields do not belong together"""
+    name, role, rounds = args
+    table = SharedTranspositionTable.attach(name)
+    bad = 0
+    try:
+        for i in range(rounds):
+            key = i % 64
+            if role == "writer":
+                # bound, move and depth are all derived from score, so a mixed entry is detectable
+                score = (i // 64 + key) % 100
+                table.store(key, score, score % 3, score % 9, score % 10)
+            else:
+                entry = table.probe(key)
+                if entry is not None and entry[1:] != (entry[0] % 3, entry[0] % 9, entry[0] % 10):
+                    bad += 1
+        return bad
+    finally:
+        table.close()
+
+
+@pytest.fixture
+def make_table():
+    tables = []
+
+    def make(buckets):
+        table = SharedTranspositionTable.create(buckets=buckets)
+        tables.append(table)
+        return table
+
+    yield make
+    for table in tables:
+        table.close()
+        table.unlink()
+
+
+def test_attached_processes_reuse_entries(make_table):
+    table = make_table(1 << 15)
+    with Pool(1) as pool:
+        cold_nodes, _, _ = pool.apply(_solve_positions, ((table.name, OPENINGS),))
+    with Pool(WORKERS) as pool:
+        results = pool.map(_solve_positions, [(table.name, OPENINGS)] * WORKERS)
+    hits = sum(hits for _, hits, _ in results)
+    assert hits > 0
+    for nodes, _, _ in results:
+        assert nodes < cold_nodes
+
+
+def test_shallower_store_keeps_deeper_entry(make_table):
+    table = make_table(1)
+    table.store(7, 10, backend.EXACT, 3, depth=6)
+    table.store(7, 20, backend.EXACT, 4, depth=2)
+    assert table.probe(7) == (10, backend.EXACT, 3, 6)
+    # The second key of the bucket goes to the other slot and is protected the same way
+    table.store(8, 30, backend.EXACT, 5, depth=1)
+    table.store(8, 40, backend.EXACT, 6, depth=0)
+    assert table.probe(8) == (30, backend.EXACT, 5, 1)
+    assert table.probe(7) == (10, backend.EXACT, 3, 6)
+
+
+def test_no_torn_reads_under_contention(make_table):
+    table = make_table(8)  # tiny table: heavy contention
+    jobs = [(table.name, "writer" if i % 2 == 0 else "reader", 200_000) for i in range(WORKERS)]
+    with Pool(WORKERS) as pool:
+        assert sum(pool.map(_hammer, jobs)) == 0
@@ -0,0 +1,252 @@
+# Search tree recorder: the explored game tree in preallocated parallel arrays
+
+"""
+TreeRecorder stores every node a search visits as one slot in parallel stdlib arrays
+(no per-node objects), 13 bytes per node:
+
+  parent  int32   index of the parent node (-1 for the root)
+  move    int8    cell played to reach the node (-1 for the root)
+  depth   uint8   plies below the root
+  score   int16   value the search returned for the node (root player's view)
+  alpha   int16   search window on entry (+-INF16 for unbounded; INF16 for Minimax)
+  beta    int16
+  flags   uint8   CUTOFF (the node's move loop stopped early), CACHED (answered by the
+                  transposition table)
+
+Nodes are numbered in the order the search entered them, so a parent always comes
+before its children. The arrays start at `capacity` slots and double when full; past
+`max_nodes` the recorder stops adding nodes and sets `truncated`.
+
+    recorder = TreeRecorder()
+    move, metrics = ttt_backend.get_ai_move(board, "X", "Alpha-Beta", recorder=recorder)
+    recorder.cutoffs_per_depth()
+    recorder.save("tree.bin")
+
+The file is a header followed by each column's raw bytes:
+
+  header  b"TTTTREE1" size:u8 win_length:u8 algorithm:u8 truncated:u8 count:u32
+
+    python tree_recorder.py --algo Minimax --size 3
+"""
+
+import argparse
+import struct
+import time
+from array import array
+from collections import Counter
+
+import ttt_backend as backend
+
+CUTOFF = 1
+CACHED = 2
+
+# Stored in place of an infinite alpha/beta (scores stay within +-WIN_SCORE)
+INF16 = 32767
+
+FIELDS = (("parent", "i"), ("move", "b"), ("depth", "B"), ("score", "h"),
+          ("alpha", "h"), ("beta", "h"), ("flags", "B"))
+BYTES_PER_NODE = sum(array(code).itemsize for _, code in FIELDS)
+
+ALGORITHMS = ("Minimax", "Alpha-Beta")
+
+MAGIC = b"TTTTREE1"
+_HEADER = struct.Struct("<8sBBBBI")
+
+
+def _bound(value):
+    if value >= INF16:
+        return INF16
+    if value <= -INF16:
+        return -INF16
+    return int(value)
+
+
+class TreeRecorder:
+    """Explored-tree arena filled by ttt_backend.get_ai_move(..., recorder=...)"""
+
+    # Read through the instance by the engines, which do not import this module
+    CUTOFF = CUTOFF
+    CACHED = CACHED
+    ALGORITHMS = ALGORITHMS
+
+    def __init__(self, capacity=1 << 16, max_nodes=20_000_000):
+        self.capacity = capacity
+        self.max_nodes = max_nodes
+        for name, code in FIELDS:
+            setattr(self, name, array(code, bytes(array(code).itemsize * capacity)))
+        self.count = 0
+        self.truncated = False
+        self.size = 0
+        self.win_length = 0
+        self.algorithm = None
+        self._stack = []  # indices of the nodes on the current search path (-1 = not recorded)
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return self.count * BYTES_PER_NODE
+
+    def _grow(self):
+        for name, code in FIELDS:
+            column = getattr(self, name)
+            column.frombytes(bytes(column.itemsize * self.capacity))
+        self.capacity *= 2
+
+    # - Recording (called by the engines)
+    def start(self, size, win_length, algorithm):
+        """Forget the previous tree and record the root of a new search"""
+        self.count = 0
+        self.truncated = False
+        self.size = size
+        self.win_length = win_length
+        self.algorithm = algorithm
+        self._stack = []
+        self.push(-1, 0)
+
+    def push(self, move, depth, alpha=None, beta=None):
+        """Enter the child reached by `move` (alpha/beta: the window passed to it)"""
+        parent = self._stack[-1] if self._stack else -1
+        index = self.count
+        if (parent < 0 and self._stack) or index >= self.max_nodes:
+            # Below a node that was not recorded, or out of room
+            self.truncated = self.truncated or index >= self.max_nodes
+            self._stack.append(-1)
+            return
+        if index == self.capacity:
+            self._grow()
+        self.parent[index] = parent
+        self.move[index] = move
+        self.depth[index] = depth
+        self.alpha[index] = INF16 if alpha is None else _bound(alpha)
+        self.beta[index] = INF16 if beta is None else _bound(beta)
+        self.flags[index] = 0
+        self.count = index + 1
+        self._stack.append(index)
+
+    def pop(self, score):
+        """Leave the current node, which the search scored `score`"""
+        index = self._stack.pop()
+        if index >= 0:
+            self.score[index] = _bound(score)
+
+    def mark(self, flag):
+        """Set a flag (CUTOFF, CACHED) on the current node"""
+        index = self._stack[-1]
+        if index >= 0:
+            self.flags[index] |= flag
+
+    # - Queries
+    def nodes_per_depth(self):
+        counts = Counter(self.depth[:self.count])
+        return [counts[depth] for depth in range(max(counts, default=-1) + 1)]
+
+    def cutoffs_per_depth(self):
+        """Nodes whose move loop was cut off, per depth"""
+        counts = Counter(depth for depth, flags in zip(self.depth[:self.count], self.flags[:self.count])
+                         if flags & CUTOFF)
+        return [counts[depth] for depth in range(len(self.nodes_per_depth()))]
+
+    def depth_table(self):
+        """Rows of (depth, nodes, cutoffs, cached, average children per expanded node)"""
+        nodes = self.nodes_per_depth()
+        cutoffs = self.cutoffs_per_depth()
+        cached = Counter(depth for depth, flags in zip(self.depth[:self.count], self.flags[:self.count])
+                         if flags & CACHED)
+        # Every node at depth d + 1 is the child of an expanded node at depth d
+        expanded = Counter(self.depth[parent] for parent in set(self.parent[1:self.count]))
+        rows = []
+        for depth, count in enumerate(nodes):
+            children = nodes[depth + 1] / expanded[depth] if expanded[depth] else 0.0
+            rows.append((depth, count, cutoffs[depth], cached[depth], round(children, 2)))
+        return rows
+
+    def children(self, index):
+        """Indices of the children of a node (in search order; scans the nodes after it)"""
+        return [child for child in range(index + 1, self.count) if self.parent[child] == index]
+
+    def line(self, index):
+        """Moves from the root to a node"""
+        moves = []
+        while index > 0:
+            moves.append(self.move[index])
+            index = self.parent[index]
+        return moves[::-1]
+
+    def summary(self):
+        nodes = self.nodes_per_depth()
+        cutoffs = sum(self.cutoffs_per_depth())
+        return {
+            "algorithm": self.algorithm,
+            "nodes": self.count,
+            "max_depth": len(nodes) - 1,
+            "cutoffs": cutoffs,
+            "bytes": self.nbytes(),
+            "truncated": self.truncated,
+        }
+
+    # - Export
+    def to_bytes(self):
+        header = _HEADER.pack(MAGIC, self.size, self.win_length, ALGORITHMS.index(self.algorithm),
+                              self.truncated, self.count)
+        return header + b"".join(getattr(self, name)[:self.count].tobytes() for name, _ in FIELDS)
+
+    def save(self, path):
+        with open(path, "wb") as handle:
+            handle.write(self.to_bytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, size, win_length, algorithm, truncated, count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a search tree file")
+        recorder = cls(capacity=max(count, 1))
+        offset = _HEADER.size
+        for name, code in FIELDS:
+            column = array(code)
+            column.frombytes(data[offset:offset + column.itemsize * count])
+            offset += column.itemsize * count
+            setattr(recorder, name, column + array(code, bytes(column.itemsize * (recorder.capacity - count))))
+        recorder.count = count
+        recorder.size, recorder.win_length = size, win_length
+        recorder.algorithm = ALGORITHMS[algorithm]
+        recorder.truncated = bool(truncated)
+        return recorder
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as handle:
+            return cls.from_bytes(handle.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the tree of one AI search and summarise it")
+    parser.add_argument("--algo", default="Alpha-Beta", choices=ALGORITHMS)
+    parser.add_argument("--size", type=int, default=3, choices=[size for size, _ in backend.GEOMETRIES])
+    parser.add_argument("--out", default=None, help="write the tree to this file")
+    args = parser.parse_args()
+
+    win_length = backend.default_win_length(args.size)
+    max_depth = backend.default_search_depth(args.size)
+    evaluator = None
+    if max_depth is not None:
+        from evaluation import LineEvaluator
+        evaluator = LineEvaluator(args.size, win_length)
+    recorder = TreeRecorder()
+    start = time.perf_counter()
+    move, metrics = backend.get_ai_move(backend.new_board(args.size), "X", args.algo, win_length=win_length,
+                                        max_depth=max_depth, evaluator=evaluator, forced_moves=False,
+                                        recorder=recorder)
+    search_s = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = recorder.depth_table()
+    query_s = time.perf_counter() - start
+    print(f"{args.algo} on an empty {args.size}x{args.size} board: move {move}, {len(recorder):,} nodes "
+          f"recorded in {search_s:.2f} s, {recorder.nbytes() / 1024:.0f} KB ({BYTES_PER_NODE} bytes/node)")
+    print(f"{'depth':>5} {'nodes':>9} {'cutoffs':>8} {'cached':>7} {'children':>8}")
+    for depth, nodes, cutoffs, cached, children in rows:
+        print(f"{depth:>5} {nodes:>9,} {cutoffs:>8,} {cached:>7,} {children:>8}")
+    print(f"Depth table computed in {query_s * 1000:.0f} ms")
+    if args.out:
+        recorder.save(args.out)
+        print(f"Wrote {args.out}")
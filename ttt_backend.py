@@ -2,24 +2,131 @@
 Backend implementation with Minimax and Alpha-Beta algorithms integrated from original AI implementation.
 """
 
+import contextlib
+import math
+import time
 from typing import List, Tuple, Dict, Optional
 
-Board = List[str]  # 9-length list with 'X', 'O', or ' '
+from utils import DeadlineToken, SearchCancelled, run_cancellable
 
-WIN_LINES = [
-    (0,1,2), (3,4,5), (6,7,8),   # rows
-    (0,3,6), (1,4,7), (2,5,8),   # cols
-    (0,4,8), (2,4,6)             # diagonals
-]
+Board = List[str]  # size*size list with 'X', 'O', or ' ' (9 cells for the standard 3x3 game)
 
-# Performance tracking variables
-_nodes_explored = 0
-_pruned_nodes = 0
+# Board geometries offered by the front ends: (size, win_length)
+GEOMETRIES = [(3, 3), (4, 4), (5, 4)]
+
+# Depth limit used by the front ends for each board size (None = search to the end)
+DEFAULT_SEARCH_DEPTH = {3: None, 4: 5, 5: 4}
+
+# Time budget of the time-limited engines (Iterative Deepening, MCTS, Auto) when none is given
+DEFAULT_TIME_LIMIT_MS = 500
+
+_SIZE_BY_CELLS = {}
+_WIN_LINES_CACHE = {}
+
+def board_size(board: Board) -> int:
+    """Return the side length of a square board."""
+    n = len(board)
+    size = _SIZE_BY_CELLS.get(n)
+    if size is None:
+        size = _SIZE_BY_CELLS[n] = math.isqrt(n)
+    return size
+
+def default_win_length(size: int) -> int:
+    """Marks in a row needed to win when no win length is given: 3 on 3x3, 4 on bigger boards."""
+    return min(size, 4)
+
+def default_search_depth(size: int) -> Optional[int]:
+    """Depth limit the front ends use for a board size (None = full search)."""
+    return DEFAULT_SEARCH_DEPTH.get(size, 3)
+
+def win_lines(size: int = 3, win_length: Optional[int] = None) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return every winning line of a size x size board as tuples of cell indices:
+    rows, then columns, then diagonals, then anti-diagonals. Lines are generated once per geometry.
+    """
+    if win_length is None:
+        win_length = default_win_length(size)
+    lines = _WIN_LINES_CACHE.get((size, win_length))
+    if lines is None:
+        if not 1 <= win_length <= size:
+            raise ValueError(f"win length must be between 1 and {size}, got {win_length}")
+        span = range(size - win_length + 1)
+        steps = range(win_length)
+        rows = [tuple(r * size + c + i for i in steps) for r in range(size) for c in span]
+        cols = [tuple((r + i) * size + c for i in steps) for c in range(size) for r in span]
+        diags = [tuple((r + i) * size + c + i for i in steps) for r in span for c in span]
+        antis = [tuple((r + i) * size + c - i for i in steps) for r in span for c in range(win_length - 1, size)]
+        lines = _WIN_LINES_CACHE[(size, win_length)] = tuple(rows + cols + diags + antis)
+    return lines
+
+WIN_LINES = list(win_lines(3, 3))
+
+_SYMMETRY_CACHE = {}
+
+def board_symmetries(size: int = 3) -> Tuple[Tuple[int, ...], ...]:
+    """
+    The 8 symmetries of a square board (rotations and reflections) as cell permutations:
+    the transformed board is [board[p] for p in perm]. The identity comes first.
+    """
+    perms = _SYMMETRY_CACHE.get(size)
+    if perms is None:
+        last = size - 1
+        maps = [
+            lambda r, c: (r, c), lambda r, c: (c, last - r), lambda r, c: (last - r, last - c),
+            lambda r, c: (last - c, r), lambda r, c: (r, last - c), lambda r, c: (last - r, c),
+            lambda r, c: (c, r), lambda r, c: (last - c, last - r),
+        ]
+        perms = _SYMMETRY_CACHE[size] = tuple(
+            tuple(src_r * size + src_c for src_r, src_c in (f(cell // size, cell % size) for cell in range(size * size)))
+            for f in maps)
+    return perms
+
+# Terminal scores are depth-adjusted: a win found at ply p scores WIN_SCORE - p,
+# so quicker wins (and slower losses) are preferred. It must exceed the number of cells.
+WIN_SCORE = 1000
+
+# Scores beyond this are wins/losses; heuristic evaluations stay within it
+MATE_BOUND = WIN_SCORE // 2
+
+# Transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+_CELL_CODES = {" ": 0, "X": 1, "O": 2}
+
+# The cancellation token is checked every _CANCEL_CHECK_MASK + 1 nodes
+_CANCEL_CHECK_MASK = 255
+
+class SearchContext:
+    """
+    Settings and performance counters of one search, passed down through minimax and
+    alphabeta. get_ai_move builds a new one for every call, so searches running at the
+    same time (e.g. one per Streamlit session thread) do not share any state.
+    """
+    __slots__ = ("win_length", "max_depth", "evaluator", "cache", "cancel", "history", "pv",
+                 "recorder", "nodes", "pruned", "cache_hits")
+
+    def __init__(self, win_length: Optional[int] = None, max_depth: Optional[int] = None,
+                 evaluator=None, cache=None, cancel=None, history: Optional[List[int]] = None,
+                 pv: Optional[List[int]] = None, recorder=None):
+        self.win_length = win_length  # None = board default
+        self.max_depth = max_depth  # None = no depth limit
+        self.evaluator = evaluator  # leaf evaluator at the depth limit, see evaluation.LineEvaluator
+        self.cache = cache  # position cache used by alphabeta, see TranspositionTable
+        self.cancel = cancel  # utils.CancelToken
+        # Move-ordering tables of an EngineSession: history scores per cell and the
+        # principal variation expected from the previous search
+        self.history = history
+        self.pv = pv
+        self.recorder = recorder  # tree_recorder.TreeRecorder
+        # Performance tracking
+        self.nodes = 0
+        self.pruned = 0
+        self.cache_hits = 0
 
 # - Public API (used by the UI) 
-def new_board() -> Board:
-    """Return an empty 3x3 board as a 9-length list of spaces."""
-    return [" "] * 9
+def new_board(size: int = 3) -> Board:
+    """Return an empty size x size board as a list of spaces (9 cells by default)."""
+    return [" "] * (size * size)
 
 def place(board: Board, idx: int, player: str) -> Board:
     """Place player's mark at idx and return the NEW board (do not mutate input)."""
@@ -31,51 +138,161 @@ def available_moves(board: Board):
     """Return list of empty cell indices."""
     return [i for i, v in enumerate(board) if v == " "]
 
-def check_result(board: Board) -> Dict:
+def check_result(board: Board, win_length: Optional[int] = None) -> Dict:
     """Return {'status': 'ongoing'|'draw'|'win', ...}."""
-    for a,b,c in WIN_LINES:
-        if board[a] != " " and board[a] == board[b] == board[c]:
-            return {"status": "win", "winner": board[a], "line": (a,b,c)}
-    if all(v != " " for v in board):
+    lines = win_lines(board_size(board), win_length)
+    if len(lines[0]) == 3:
+        # Fast path for three-in-a-row (the standard game)
+        for a, b, c in lines:
+            if board[a] != " " and board[a] == board[b] == board[c]:
+                return {"status": "win", "winner": board[a], "line": (a, b, c)}
+        lines = ()
+    for line in lines:
+        first = board[line[0]]
+        if first == " ":
+            continue
+        for i in line:
+            if board[i] != first:
+                break
+        else:
+            return {"status": "win", "winner": first, "line": line}
+    if " " not in board:
         return {"status": "draw"}
     return {"status": "ongoing"}
 
-def check_winner_1d(board: Board) -> Optional[str]:
+def check_winner_1d(board: Board, win_length: Optional[int] = None) -> Optional[str]:
     """Check winner for 1D board format. Returns 'X', 'O', 'Draw', or None."""
-    result = check_result(board)
+    result = check_result(board, win_length)
     if result["status"] == "win":
         return result["winner"]
     elif result["status"] == "draw":
         return "Draw"
     return None
 
-def minimax(board: Board, is_maximizing: bool, ai_player: str, human_player: str) -> Tuple[int, Optional[int]]:
+def position_key(board: Board, to_move: str, win_length: Optional[int] = None) -> int:
+    """
+    Encode the board (base 3, one digit per cell), the side to move and the geometry as an
+    integer. The low byte holds the board size and win length, so positions of different
+    geometries (e.g. a 3x3 and a 4x4 board with empty leading cells) never share a key.
+    """
+    size = board_size(board)
+    if win_length is None:
+        win_length = default_win_length(size)
+    key = 0
+    for v in board:
+        key = key * 3 + _CELL_CODES[v]
+    return ((key * 2 + (to_move == "O")) << 8) | (size << 4) | win_length
+
+class TranspositionTable:
+    """
+    In-process position cache for alphabeta.
+    Entries are (score, bound, move, depth, generation, stones) with scores stored from
+    X's point of view and relative to the stored position, so they can be shared between
+    searches. `generation` is bumped once per search (see EngineSession) so lookups that
+    reuse an earlier search's work can be counted, and `stones` lets stale entries be pruned.
+    SharedTranspositionTable in shared_tt.py implements the same probe/store interface.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.reused = 0  # hits on entries stored by an earlier generation
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, Optional[int], int, int, int]]:
+        self.probes += 1
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            if entry[4] != self.generation:
+                self.reused += 1
+        return entry
+
+    def store(self, key: int, score: int, bound: int, move: Optional[int], depth: int, stones: int = 0) -> None:
+        old = self.entries.get(key)
+        if old is None or depth >= old[3]:
+            self.entries[key] = (score, bound, move, depth, self.generation, stones)
+
+    def new_generation(self) -> None:
+        self.generation += 1
+
+    def prune(self, min_stones: int) -> int:
+        """Drop entries for positions with fewer than min_stones marks (no longer reachable)."""
+        stale = [key for key, entry in self.entries.items() if entry[5] < min_stones]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+def to_table_score(score: int, ply: int, sign: int) -> int:
+    """Convert a root-relative score for the AI into a node-relative score for X."""
+    if score > MATE_BOUND:
+        score += ply
+    elif score < -MATE_BOUND:
+        score -= ply
+    return score * sign
+
+def from_table_score(score: int, ply: int, sign: int) -> int:
+    """Inverse of to_table_score."""
+    score *= sign
+    if score > MATE_BOUND:
+        score -= ply
+    elif score < -MATE_BOUND:
+        score += ply
+    return score
+
+def minimax(board: Board, is_maximizing: bool, ai_player: str, human_player: str, ply: int = 0,
+            ctx: Optional[SearchContext] = None) -> Tuple[int, Optional[int]]:
     """
     Standard Minimax algorithm implementation for 1D board.
+    `ply` is the distance from the root and is used for mate-distance scoring.
+    `ctx` holds the search settings and counters (a default SearchContext if None).
     Returns (score, best_move).
     """
-    global _nodes_explored
-    _nodes_explored += 1
+    if ctx is None:
+        ctx = SearchContext()
+    ctx.nodes += 1
+    if ctx.cancel is not None and not ctx.nodes & _CANCEL_CHECK_MASK and ctx.cancel.cancelled:
+        raise SearchCancelled()
     
-    winner = check_winner_1d(board)
+    winner = check_winner_1d(board, ctx.win_length)
     
     # Base cases
     if winner == ai_player:
-        return 10, None
+        return WIN_SCORE - ply, None
     elif winner == human_player:
-        return -10, None
+        return -(WIN_SCORE - ply), None
     elif winner == 'Draw':
         return 0, None
+    evaluator = ctx.evaluator
+    if ctx.max_depth is not None and ply >= ctx.max_depth:
+        # Depth limit reached: use the heuristic evaluation, or treat as undecided
+        return (evaluator.score(ai_player) if evaluator is not None else 0), None
     
     moves = available_moves(board)
+    recorder = ctx.recorder
     
     if is_maximizing:
         best_score = float('-inf')
         best_move = None
         for move in moves:
             board[move] = ai_player
-            score, _ = minimax(board, False, ai_player, human_player)
+            if evaluator is not None:
+                evaluator.place(move, ai_player)
+            if recorder is not None:
+                recorder.push(move, ply + 1)
+            score, _ = minimax(board, False, ai_player, human_player, ply + 1, ctx)
+            if recorder is not None:
+                recorder.pop(score)
             board[move] = " "
+            if evaluator is not None:
+                evaluator.remove(move, ai_player)
             
             if score > best_score:
                 best_score = score
@@ -86,41 +303,126 @@ def minimax(board: Board, is_maximizing: bool, ai_player: str, human_player: str
         best_move = None
         for move in moves:
             board[move] = human_player
-            score, _ = minimax(board, True, ai_player, human_player)
+            if evaluator is not None:
+                evaluator.place(move, human_player)
+            if recorder is not None:
+                recorder.push(move, ply + 1)
+            score, _ = minimax(board, True, ai_player, human_player, ply + 1, ctx)
+            if recorder is not None:
+                recorder.pop(score)
             board[move] = " "
+            if evaluator is not None:
+                evaluator.remove(move, human_player)
             
             if score < best_score:
                 best_score = score
                 best_move = move
         return best_score, best_move
 
-def alphabeta(board: Board, alpha: float, beta: float, is_maximizing: bool, ai_player: str, human_player: str) -> Tuple[int, Optional[int]]:
+def _order_moves(moves: List[int], tt_move: Optional[int], ply: int, ctx: SearchContext) -> List[int]:
+    """Order moves for search: cached best move, then the expected PV move, then by history score."""
+    history, pv = ctx.history, ctx.pv
+    ordered = sorted(moves, key=lambda m: -history[m])
+    for first in ((pv[ply] if ply < len(pv) else None), tt_move):
+        if first is not None and first in ordered:
+            ordered.remove(first)
+            ordered.insert(0, first)
+    return ordered
+
+def alphabeta(board: Board, alpha: float, beta: float, is_maximizing: bool, ai_player: str, human_player: str,
+              ply: int = 0, ctx: Optional[SearchContext] = None) -> Tuple[int, Optional[int]]:
     """
-    Alpha-Beta Pruning optimization of Minimax for 1D board.
+    Alpha-Beta Pruning optimization of Minimax for 1D board, with mate-distance pruning.
+    `ply` is the distance from the root and is used for mate-distance scoring.
+    `ctx` holds the search settings and counters (a default SearchContext if None).
     Returns (score, best_move).
     """
-    global _nodes_explored, _pruned_nodes
-    _nodes_explored += 1
+    if ctx is None:
+        ctx = SearchContext()
+    ctx.nodes += 1
+    if ctx.cancel is not None and not ctx.nodes & _CANCEL_CHECK_MASK and ctx.cancel.cancelled:
+        raise SearchCancelled()
     
-    winner = check_winner_1d(board)
+    winner = check_winner_1d(board, ctx.win_length)
     
     # Base cases
     if winner == ai_player:
-        return 10, None
+        return WIN_SCORE - ply, None
     elif winner == human_player:
-        return -10, None
+        return -(WIN_SCORE - ply), None
     elif winner == 'Draw':
         return 0, None
+    evaluator = ctx.evaluator
+    max_depth = ctx.max_depth
+    if max_depth is not None and ply >= max_depth:
+        # Depth limit reached: use the heuristic evaluation, or treat as undecided
+        return (evaluator.score(ai_player) if evaluator is not None else 0), None
+    
+    # Mate-distance pruning: no result below this node can be better than a
+    # win on the next ply (or worse than a loss on the next ply), so narrow the window
+    bound = WIN_SCORE - (ply + 1)
+    alpha = max(alpha, -bound)
+    beta = min(beta, bound)
+    if alpha >= beta:
+        ctx.pruned += 1
+        return alpha, None
     
     moves = available_moves(board)
+    # Remaining search depth below this node, used to validate cached entries
+    depth = len(moves) if max_depth is None else min(len(moves), max_depth - ply)
+    recorder = ctx.recorder
+    history = ctx.history
+    
+    # Transposition table lookup
+    key = None
+    tt_move = None
+    cache = ctx.cache
+    if cache is not None:
+        sign = 1 if ai_player == "X" else -1
+        key = position_key(board, ai_player if is_maximizing else human_player, ctx.win_length)
+        alpha_orig, beta_orig = alpha, beta
+        entry = cache.probe(key)
+        if entry is not None:
+            tt_move = entry[2]
+        # The root always searches: a cached best move may be a different (equally
+        # scored) move than the first-best one in board order
+        if entry is not None and entry[3] >= depth and ply > 0:
+            ctx.cache_hits += 1
+            score = from_table_score(entry[0], ply, sign)
+            bound = entry[1] if sign == 1 else (EXACT, UPPER, LOWER)[entry[1]]
+            if bound == EXACT:
+                if recorder is not None:
+                    recorder.mark(recorder.CACHED)
+                return score, entry[2]
+            if bound == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                if recorder is not None:
+                    recorder.mark(recorder.CACHED)
+                return score, entry[2]
+    
+    # Session move ordering below the root (the root keeps board order, so the chosen move
+    # is the same first-best move as without a session)
+    if history is not None and ply > 0:
+        moves = _order_moves(moves, tt_move, ply, ctx)
     
     if is_maximizing:
         best_score = float('-inf')
         best_move = None
         for move in moves:
             board[move] = ai_player
-            score, _ = alphabeta(board, alpha, beta, False, ai_player, human_player)
+            if evaluator is not None:
+                evaluator.place(move, ai_player)
+            if recorder is not None:
+                recorder.push(move, ply + 1, alpha, beta)
+            score, _ = alphabeta(board, alpha, beta, False, ai_player, human_player, ply + 1, ctx)
+            if recorder is not None:
+                recorder.pop(score)
             board[move] = " "
+            if evaluator is not None:
+                evaluator.remove(move, ai_player)
             
             if score > best_score:
                 best_score = score
@@ -129,16 +431,27 @@ def alphabeta(board: Board, alpha: float, beta: float, is_maximizing: bool, ai_p
             # Alpha-Beta pruning
             alpha = max(alpha, best_score)
             if beta <= alpha:
-                _pruned_nodes += 1
+                ctx.pruned += 1
+                if history is not None:
+                    history[move] += depth * depth
+                if recorder is not None:
+                    recorder.mark(recorder.CUTOFF)
                 break  # Prune the remaining branches
-        return best_score, best_move
     else:
         best_score = float('inf')
         best_move = None
         for move in moves:
             board[move] = human_player
-            score, _ = alphabeta(board, alpha, beta, True, ai_player, human_player)
+            if evaluator is not None:
+                evaluator.place(move, human_player)
+            if recorder is not None:
+                recorder.push(move, ply + 1, alpha, beta)
+            score, _ = alphabeta(board, alpha, beta, True, ai_player, human_player, ply + 1, ctx)
+            if recorder is not None:
+                recorder.pop(score)
             board[move] = " "
+            if evaluator is not None:
+                evaluator.remove(move, human_player)
             
             if score < best_score:
                 best_score = score
@@ -147,54 +460,289 @@ def alphabeta(board: Board, alpha: float, beta: float, is_maximizing: bool, ai_p
             # Alpha-Beta pruning
             beta = min(beta, best_score)
             if beta <= alpha:
-                _pruned_nodes += 1
+                ctx.pruned += 1
+                if history is not None:
+                    history[move] += depth * depth
+                if recorder is not None:
+                    recorder.mark(recorder.CUTOFF)
                 break  # Prune the remaining branches
-        return best_score, best_move
+    
+    if key is not None:
+        if best_score <= alpha_orig:
+            bound = UPPER
+        elif best_score >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if sign == -1 and bound != EXACT:
+            bound = LOWER if bound == UPPER else UPPER
+        cache.store(key, to_table_score(best_score, ply, sign), bound, best_move, depth, len(board) - len(moves))
+    return best_score, best_move
 
-def get_ai_move(board: Board, player: str, algo: str) -> Tuple[int, Dict]:
+def score_line(board: Board, player: str, ply: int, win_length: Optional[int] = None,
+               max_depth: Optional[int] = None, evaluator=None) -> Tuple[int, int]:
+    """
+    Exact Alpha-Beta score of a position `ply` moves below a root where `player` was to move
+    (the side to move is player when ply is even). The score is relative to that root, so
+    scores of different lines can be compared as in a single search; used by distributed.py
+    to search root subtrees on other machines.
+    Returns (score, nodes).
+    """
+    opponent = "O" if player == "X" else "X"
+    ctx = SearchContext(win_length, max_depth)
+    if evaluator is not None and max_depth is not None:
+        evaluator.reset(board)
+        ctx.evaluator = evaluator
+    score, _ = alphabeta(list(board), float('-inf'), float('inf'), ply % 2 == 0, player, opponent, ply, ctx)
+    return score, ctx.nodes
+
+def _iterative_deepening(board: Board, ai_player: str, human_player: str, time_limit_ms: float,
+                         max_depth: Optional[int], ctx: SearchContext) -> Tuple[int, Optional[int], int]:
+    """
+    Alpha-Beta to depth 1, 2, ... until the time limit runs out (the unfinished iteration
+    is discarded), the search reaches the end of the game or a win or loss is proven.
+    The first iteration always completes. ctx.max_depth and ctx.cancel are set per iteration.
+    Returns (score, best_move, depth of the last completed iteration).
+    """
+    cancel = ctx.cancel
+    evaluator = ctx.evaluator
+    deadline = DeadlineToken(time_limit_ms / 1000.0, cancel)
+    limit = len(available_moves(board))
+    if max_depth is not None:
+        limit = min(limit, max_depth)
+    score, move, completed = 0, None, 0
+    for depth in range(1, limit + 1):
+        iteration_start = time.perf_counter()
+        ctx.max_depth = depth
+        ctx.cancel = cancel if depth == 1 else deadline
+        if evaluator is not None:
+            evaluator.reset(board)
+        try:
+            # A cancelled iteration leaves its board copy mid-search
+            score, move = alphabeta(list(board), float('-inf'), float('inf'), True, ai_player, human_player, 0, ctx)
+        except SearchCancelled:
+            if cancel is not None and cancel.cancelled:
+                raise
+            break
+        completed = depth
+        if abs(score) > MATE_BOUND:
+            break  # proven win or loss
+        if deadline.remaining() < time.perf_counter() - iteration_start:
+            break  # the next, deeper iteration cannot finish in time
+    return score, move, completed
+
+def get_ai_move(board: Board, player: str, algo: str, cache=None, cancel=None,
+                win_length: Optional[int] = None, max_depth: Optional[int] = None,
+                evaluator=None, forced_moves: bool = True, session=None,
+                profile_memory: bool = False, book=None,
+                time_limit_ms: Optional[float] = None, recorder=None) -> Tuple[int, Dict]:
     """
     Get the best move for AI using the selected algorithm.
+    `cache` is an optional position cache for Alpha-Beta (a TranspositionTable or a
+    shared_tt.SharedTranspositionTable); it can be reused across moves and games.
+    `cancel` is an optional utils.CancelToken; the search raises SearchCancelled once it is set.
+    `win_length` defaults to default_win_length(board size); `max_depth` limits the search
+    to that many plies (None = search to the end, see default_search_depth).
+    `evaluator` scores positions at the depth limit (an evaluation.LineEvaluator for this
+    geometry); without one they score 0.
+    With `forced_moves`, immediate wins, forced blocks and forks are played without a
+    search (see tactics.py); metrics["tactic"] names the rule that fired, if any.
+    `session` is an EngineSession for the current game: its cache and move-ordering tables
+    are reused from the previous move, and metrics["reused"] counts cache lookups answered
+    by earlier searches.
+    `algo` is "Minimax", "Alpha-Beta", "PN-Search", "Iterative Deepening", "MCTS" or "Auto".
+    PN-Search proves the result with proof-number search (see pns.py) within `time_limit_ms`
+    (DEFAULT_TIME_LIMIT_MS if None) and reports it in metrics["result"] ("win", "loss",
+    "draw", or "unknown" when the proof ran out of memory or time and iterative deepening chose
+    the move in the time left).
+    With `profile_memory`, the search runs under tracemalloc and metrics gain peak_kb,
+    alloc_blocks and bytes_per_node (see memory_profile.py).
+    `book` is an opening_book.OpeningBook; a book move is played without searching and
+    metrics["book"] is True.
+    "Iterative Deepening" runs Alpha-Beta one ply deeper at a time for `time_limit_ms`
+    (DEFAULT_TIME_LIMIT_MS if None) and plays the move of the deepest finished iteration,
+    metrics["depth"]; `max_depth` caps the depth and `evaluator` scores its leaves.
+    "MCTS" runs Monte Carlo tree search for `time_limit_ms` (see mcts.py).
+    "Auto" picks one of the engines for each move from a measured cost model so the move
+    takes about `time_limit_ms`; metrics["engine"] and metrics["reason"] say which and why
+    (see auto.py).
+    `recorder` is a tree_recorder.TreeRecorder; Minimax and Alpha-Beta searches write every
+    node they visit into it (replacing its previous tree) and metrics["tree_nodes"] is set.
     Returns (move_index, metrics).
     """
-    global _nodes_explored, _pruned_nodes
-    
-    # Reset performance tracking
-    _nodes_explored = 0
-    _pruned_nodes = 0
+    # The engines and instrumentation import this module, so they are imported where used
+    if algo == "Auto":
+        import auto
+        return auto.get_auto_move(board, player, cache, cancel, win_length, max_depth, evaluator,
+                                  forced_moves, session, profile_memory, book, time_limit_ms,
+                                  recorder=recorder)
     
     # Determine players
     ai_player = player
     human_player = "O" if player == "X" else "X"
     
     # Check if board is full or game is over
-    if check_winner_1d(board) is not None:
+    if check_winner_1d(board, win_length) is not None:
         return 0, {"nodes": 0, "pruned": 0, "prune_pct": 0.0}
     
     moves = available_moves(board)
     if not moves:
         return 0, {"nodes": 0, "pruned": 0, "prune_pct": 0.0}
     
-    # Get best move using selected algorithm
-    if algo == "Alpha-Beta":
-        score, move = alphabeta(board, float('-inf'), float('inf'), True, ai_player, human_player)
-        total_nodes = _nodes_explored
-        pruned_count = _pruned_nodes
+    start = time.perf_counter()
+    import metrics as engine_metrics
+    
+    # Opening book
+    if book is not None:
+        move = book.lookup(board, player, win_length)
+        if move is not None:
+            if algo in ("Alpha-Beta", "Iterative Deepening"):
+                metrics = {"nodes": 0, "pruned": 0, "prune_pct": 0.0, "tactic": None, "book": True}
+            else:
+                metrics = {"nodes": 0, "pruned": None, "prune_pct": None, "tactic": None, "book": True}
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            engine_metrics.record_search(algo, elapsed_ms, 0)
+            engine_metrics.record_book_hit(algo)
+            return move, metrics
+    
+    # Forced-move fast path
+    if forced_moves:
+        import tactics
+        move, tactic = tactics.find_forced_move(board, player, win_length)
+        if move is not None:
+            if algo in ("Alpha-Beta", "Iterative Deepening"):
+                metrics = {"nodes": 0, "pruned": 0, "prune_pct": 0.0, "tactic": tactic}
+            else:
+                metrics = {"nodes": 0, "pruned": None, "prune_pct": None, "tactic": tactic}
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            engine_metrics.record_search(algo, elapsed_ms, 0)
+            engine_metrics.record_forced_move(algo, tactic)
+            return move, metrics
+    
+    if session is not None:
+        if cache is None:
+            cache = session.table
+        reused_before = session.begin_search()
+    
+    # Get best move using selected algorithm. The engines mark cells in place, so they work on
+    # a copy: a cancelled search stops mid-line and would leave the caller's board corrupted.
+    board = list(board)
+    ctx = SearchContext(win_length, max_depth, cancel=cancel)
+    if evaluator is not None and (max_depth is not None or algo == "Iterative Deepening"):
+        evaluator.reset(board)
+        ctx.evaluator = evaluator
+    if time_limit_ms is None:
+        time_limit_ms = DEFAULT_TIME_LIMIT_MS
+    if recorder is not None and algo in recorder.ALGORITHMS:
+        size = board_size(board)
+        recorder.start(size, win_length or default_win_length(size), algo)
+        ctx.recorder = recorder
+    if profile_memory:
+        import memory_profile
+        profile = memory_profile.MemoryProfile()
+    else:
+        profile = contextlib.nullcontext()
+    with profile:
+        if algo == "Alpha-Beta":
+            ctx.cache = cache
+            if session is not None:
+                ctx.history = session.history
+                ctx.pv = session.pv
+            score, move = alphabeta(board, float('-inf'), float('inf'), True, ai_player, human_player, 0, ctx)
+        elif algo == "Iterative Deepening":
+            # Earlier iterations order the moves of later ones through the cache
+            ctx.cache = cache if cache is not None else TranspositionTable()
+            ctx.history = session.history if session is not None else [0] * len(board)
+            ctx.pv = session.pv if session is not None else []
+            score, move, depth_reached = _iterative_deepening(board, ai_player, human_player,
+                                                              time_limit_ms, max_depth, ctx)
+        elif algo == "MCTS":
+            import mcts
+            move, tree_metrics = mcts.search(board, player, win_length, time_limit_ms, cancel=cancel)
+        elif algo == "PN-Search":
+            import pns
+            result, move, proof_metrics = pns.solve(board, player, win_length, cancel=cancel,
+                                                    time_limit_ms=time_limit_ms)
+            if result is None:
+                # Proof budget exhausted: play the Alpha-Beta move of the time left instead
+                remaining_ms = max(0.0, time_limit_ms - (time.perf_counter() - start) * 1000.0)
+                ctx.cache = cache if cache is not None else TranspositionTable()
+                score, move, _ = _iterative_deepening(board, ai_player, human_player,
+                                                      remaining_ms, max_depth, ctx)
+        else:  # Minimax
+            score, move = minimax(board, True, ai_player, human_player, 0, ctx)
+    
+    if algo in ("Alpha-Beta", "Iterative Deepening"):
+        total_nodes = ctx.nodes
+        pruned_count = ctx.pruned
         prune_pct = (pruned_count / total_nodes * 100.0) if total_nodes > 0 else 0.0
         metrics = {
             "nodes": total_nodes,
             "pruned": pruned_count,
-            "prune_pct": round(prune_pct, 2)
+            "prune_pct": round(prune_pct, 2),
+            "tactic": None
         }
-    else:  # Minimax
-        score, move = minimax(board, True, ai_player, human_player)
+        if cache is not None:
+            metrics["cache_hits"] = ctx.cache_hits
+        if algo == "Iterative Deepening":
+            metrics["depth"] = depth_reached
+    elif algo == "MCTS":
         metrics = {
-            "nodes": _nodes_explored,
+            "nodes": tree_metrics["nodes"],
             "pruned": None,
-            "prune_pct": None
+            "prune_pct": None,
+            "tactic": None,
+            "playouts": tree_metrics["playouts"],
+            "win_rate": tree_metrics["win_rate"],
+        }
+    elif algo == "PN-Search":
+        metrics = {
+            "nodes": proof_metrics["nodes"] + ctx.nodes,
+            "pruned": None,
+            "prune_pct": None,
+            "tactic": None,
+            "result": result or "unknown",
+            "table_size": proof_metrics["table_size"],
+            "peak_nodes": proof_metrics["peak_nodes"],
+            "proof_ms": proof_metrics["elapsed_ms"],
+        }
+    else:
+        metrics = {
+            "nodes": ctx.nodes,
+            "pruned": None,
+            "prune_pct": None,
+            "tactic": None
         }
     
+    if profile_memory:
+        metrics.update(profile.metrics(metrics["nodes"]))
+    if recorder is not None and algo in recorder.ALGORITHMS:
+        recorder.pop(score)
+        metrics["tree_nodes"] = len(recorder)
+    
     # Fallback to first available move if no move found
     if move is None:
         move = moves[0]
     
+    if session is not None:
+        metrics["reused"] = session.end_search(board, player, move, reused_before)
+    
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    engine_metrics.record_search(algo, elapsed_ms, metrics["nodes"], metrics["pruned"] or 0,
+                                 metrics.get("cache_hits", 0), metrics.get("reused", 0))
+    
     return move, metrics
+
+async def get_ai_move_async(board: Board, player: str, algo: str, cache=None,
+                            win_length: Optional[int] = None, max_depth: Optional[int] = None,
+                            evaluator=None, forced_moves: bool = True, session=None,
+                            profile_memory: bool = False, book=None,
+                            time_limit_ms: Optional[float] = None, recorder=None) -> Tuple[int, Dict]:
+    """
+    Coroutine version of get_ai_move. The search runs in the shared search executor,
+    so the event loop is not blocked. Cancelling the awaiting task stops the search
+    within a few hundred nodes and frees the worker.
+    """
+    return await run_cancellable(
+        lambda token: get_ai_move(list(board), player, algo, cache, token, win_length, max_depth, evaluator,
+                                  forced_moves, session, profile_memory, book, time_limit_ms, recorder))
@@ -1,5 +1,7 @@
 # Utility functions and classes for Tic Tac Toe game
 
+import time
+
 class PerformanceTracker:
     def __init__(self):
         self.reset()
@@ -9,6 +11,12 @@ class PerformanceTracker:
         self.nodes_explored = 0
         self.pruned_nodes = 0
         self.total_decision_time = 0
+        self.forced_move = None  # tactic that chose the move without a search, if any
+        self.book_move = False  # move came from the opening book
+        self.reused = 0  # cache hits on entries from an earlier move's search (EngineSession)
+        self.memory = {}  # peak_kb, alloc_blocks, bytes_per_node when memory profiling is on
+        self.engine = None  # engine the 'auto' algorithm chose, and why
+        self.engine_reason = None
     
     def increment_nodes_explored(self):
         """Increment the count of nodes explored"""
@@ -35,5 +43,72 @@ class PerformanceTracker:
             'decision_time': round(self.total_decision_time, 4),  # in milliseconds
             'nodes_explored': total_nodes,
             'pruned_nodes': self.pruned_nodes,
-            'pruning_efficiency': round(pruned_percentage, 2)
+            'pruning_efficiency': round(pruned_percentage, 2),
+            'forced_move': self.forced_move,
+            'book_move': self.book_move,
+            'reused': self.reused,
+            'peak_kb': self.memory.get('peak_kb'),
+            'alloc_blocks': self.memory.get('alloc_blocks'),
+            'bytes_per_node': self.memory.get('bytes_per_node'),
+            'engine': self.engine,
+            'engine_reason': self.engine_reason
         }
+
+
+class SearchCancelled(Exception):
+    """Raised inside a search when its CancelToken has been cancelled"""
+
+
+class CancelToken:
+    """Cooperative cancellation flag checked by the search loops"""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class DeadlineToken:
+    """CancelToken that is cancelled once `seconds` have passed (or when `cancel`, an
+    optional outer token, is cancelled). Used for time-limited searches."""
+
+    def __init__(self, seconds, cancel=None):
+        self.deadline = time.perf_counter() + seconds
+        self.cancel = cancel
+
+    @property
+    def cancelled(self):
+        return time.perf_counter() >= self.deadline or (self.cancel is not None and self.cancel.cancelled)
+
+    def remaining(self):
+        """Seconds left until the deadline"""
+        return self.deadline - time.perf_counter()
+
+
+_search_executor = None
+
+
+def get_search_executor():
+    """Shared executor used by the async engine APIs.
+    A single worker keeps searches serialized, so async searches never compete for the CPU."""
+    global _search_executor
+    if _search_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ttt-search")
+    return _search_executor
+
+
+async def run_cancellable(func, *args):
+    """Run func(*args, cancel_token) in the search executor.
+    If the awaiting task is cancelled, the token is cancelled too so the search stops
+    at its next check and frees the worker, and asyncio.CancelledError propagates."""
+    import asyncio
+    token = CancelToken()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_search_executor(), func, *args, token)
+    try:
+        return await future
+    except asyncio.CancelledError:
+        token.cancel()
+        raise